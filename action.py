@@ -1,12 +1,23 @@
 import os
 import os.path as osp
 import sys
+import csv
+import json
+import math
+import time
+import functools
+import threading
 import base64
-import tempfile
+import shutil
 import subprocess
+from fractions import Fraction
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from io import BytesIO
 import requests
+import cv2
+import numpy as np
+import torch
 
 # LivePortrait imports (현재 디렉토리에서 LivePortrait-main까지의 경로 추가)
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,41 +29,804 @@ from src.config.argument_config import ArgumentConfig
 from src.config.inference_config import InferenceConfig
 from src.config.crop_config import CropConfig
 from src.live_portrait_pipeline import LivePortraitPipeline
+from src.utils.helper import is_image, is_video, is_template
+from src.utils.video import has_audio_stream
+from src.utils.crop import _transform_img, average_bbox_lst, crop_image_by_bbox, parse_bbox_from_landmark
+from src.utils.io import contiguous
+import src.live_portrait_pipeline as lp_pipeline_module
+
+from job_utils import get_scratch_storage
+
+
+# 품질 프리셋 - quality 옵션으로 선택하며, 프리셋 값이 개별 옵션보다 우선함
+# preview 목표 지연 시간: 10초 길이 25fps 드라이빙 클립 기준 GPU 워커에서 10초 이내,
+# 같은 클립의 final 대비 3배 이상 빠를 것 (benchmark.py quality로 확인)
+QUALITY_PRESETS = {
+    'final': {},
+    'preview': {
+        'driving_max_fps': 12,  # 드라이빙 프레임 수 절반 이하로
+        'source_max_dim': 640,
+        'flag_pasteback': False,  # paste-back 생략 (512 크롭 결과 그대로)
+        'output_scale': 0.5,
+        'video_preset': 'ultrafast',
+        'video_crf': 28,
+    },
+}
+
+# 정지 이미지 소스의 paste-back 블렌딩 배치 크기 (frame_batch_size가 더 크면 그 값을 사용)
+PASTEBACK_BATCH_SIZE = 8
+
+
+def _is_out_of_memory(error):
+    """CUDA/CPU 메모리 할당 실패 여부 확인"""
+    if isinstance(error, MemoryError):
+        return True
+    message = str(error).lower()
+    return "out of memory" in message or "can't allocate memory" in message
+
+
+class _PendingFrame:
+    """배치 처리가 끝나기 전까지 결과 프레임 자리를 대신하는 객체"""
+    __slots__ = ('stage', 'index')
+
+    def __init__(self, stage, index):
+        self.stage = stage
+        self.index = index
+
+    def resolve(self):
+        return self.stage.result(self.index)
+
+
+def _resolve_frame(frame):
+    """_PendingFrame이면 실제 프레임(np.ndarray)으로 변환"""
+    return frame.resolve() if isinstance(frame, _PendingFrame) else frame
+
+
+class _DeadlineExceeded(Exception):
+    """deadline_ms까지 남은 시간이 인코딩 여유분보다 적어져 렌더링 루프를 멈출 때 사용"""
+
+
+class _DeadlineController:
+    """deadline_ms 안에 변환을 끝내기 위한 단계적 품질 저하
+    
+    check_interval 프레임마다 최근 프레임 처리 속도로 남은 프레임의 처리 시간을 예측하고,
+    마감을 넘길 것 같으면 효과가 있는 단계만 하나씩 적용함 (렌더링 속도를 높이는 단계 먼저):
+      1) 드라이빙 FPS 낮추기 - frame_step 프레임마다 한 번만 렌더링하고 나머지는 이전 결과 재사용
+         (정지 이미지 소스만 - 소스 영상은 프레임마다 소스가 바뀌어 재사용할 수 없음)
+      2) paste-back 생략 - 원본 이미지 대신 512 크롭 결과를 출력 (paste-back 중일 때만)
+      3) 출력 해상도를 preview 프리셋 크기로 축소 - 렌더링은 그대로이고 인코딩 시간만 줄므로
+         인코딩용 여유 시간(reserve)을 픽셀 수 비율만큼 줄여 렌더링에 씀
+    그래도 시간이 다 되면 _DeadlineExceeded로 루프를 멈추고 그때까지 렌더링한 부분 영상을 저장함.
+    """
+
+    def __init__(self, deadline_ms, check_interval=8, max_frame_step=3, encode_reserve=0.15):
+        self.deadline_ms = deadline_ms
+        self.budget = deadline_ms / 1000
+        self.deadline = time.perf_counter() + self.budget
+        self.check_interval = check_interval
+        self.max_frame_step = max_frame_step
+        self.reserve = self.budget * encode_reserve  # 인코딩/오디오 mux용으로 남겨 둘 시간
+        self.n_frames = None  # 드라이빙 프레임 수 (load_video에서 기록)
+        self.fps = None  # 드라이빙 FPS (get_fps에서 기록)
+        self.static_source = True  # False면 프레임 재사용(1단계) 불가 (_build_patches에서 설정)
+        self.frame_step = 1
+        self.output_scale = None
+        self.pasteback = True
+        self.degradations = []
+        self.crops = []  # 루프 반복마다 생성된 크롭 결과 (부분 영상 저장용)
+        self.pasted = []  # 루프 반복마다 paste-back 결과
+        self._window = None  # (시각, 프레임 수) - 최근 check_interval 프레임의 시작점
+
+    def remaining(self):
+        return self.deadline - time.perf_counter()
+
+    def on_frame(self):
+        """렌더링 루프에서 프레임마다 호출: 남은 시간 확인 후 필요하면 품질 저하 단계 올림"""
+        now = time.perf_counter()
+        seen = len(self.crops)
+        if seen and self.deadline - now < self.reserve:
+            raise _DeadlineExceeded()
+        if self._window is None:
+            self._window = (now, seen)
+            return
+        window_start, window_frames = self._window
+        if seen - window_frames < self.check_interval or not self.n_frames:
+            return
+        
+        per_frame = (now - window_start) / (seen - window_frames)
+        needed = per_frame * (self.n_frames - seen)
+        available = self.deadline - now - self.reserve
+        self._window = (now, seen)
+        if needed > available:
+            self._degrade(needed / available if available > 0 else float('inf'))
+
+    def _degrade(self, ratio):
+        if self.static_source and self.frame_step < self.max_frame_step:
+            self.frame_step = min(self.max_frame_step, math.ceil(self.frame_step * ratio))
+            self.degradations.append(f"driving_fps_1/{self.frame_step}")
+        elif self.pasteback and self.pasted:
+            self.pasteback = False
+            self.degradations.append('no_pasteback')
+        elif self.output_scale is None:
+            self.output_scale = QUALITY_PRESETS['preview']['output_scale']
+            self.reserve *= self.output_scale ** 2
+            self.degradations.append('preview_resolution')
+        else:
+            return
+        print(f"⏱️  마감({self.deadline_ms}ms) 맞추기 위해 품질 저하: {self.degradations[-1]} "
+              f"(예상 초과 x{ratio:.2f})")
+
+    def skip(self, frame_index):
+        """frame_step에 따라 이전 결과를 재사용할 프레임인지"""
+        return frame_index % self.frame_step != 0
+
+    def stats(self, partial=False, frames_written=None):
+        return {
+            'deadline_ms': self.deadline_ms,
+            'degradations': list(self.degradations),
+            'frame_step': self.frame_step,
+            'partial': partial,
+            'frames_written': frames_written,
+        }
+
+
+class _BatchedWarpDecoder:
+    """warp_decode 호출을 모아 K개 프레임 단위로 warping module + generator에 한 번에 통과
+    
+    reuse_eps > 0이면 드라이빙 키포인트가 마지막으로 렌더링한 프레임과 거의 같은 경우
+    네트워크를 다시 돌리지 않고 이전 결과 프레임을 재사용함. warp_decode에 들어오는
+    키포인트는 표정/포즈/스케일/이동이 모두 반영된 최종 키포인트이므로 이것만 비교함.
+    """
+
+    def __init__(self, live_portrait_wrapper, batch_size, reuse_eps=0.0, stats=None, deadline=None):
+        self.warp_decode = live_portrait_wrapper.warp_decode  # 원본 메서드
+        self.parse_output = live_portrait_wrapper.parse_output  # 원본 메서드
+        self.batch_size = max(1, int(batch_size))
+        self.reuse_eps = reuse_eps
+        self.deadline = deadline  # _DeadlineController (마감 시간 지정 시)
+        self.stats = stats if stats is not None else {}
+        self.stats.update({'frames_total': 0, 'frames_rendered': 0, 'frames_skipped': 0})
+        self.queue = []  # (index, feature_3d, kp_source, kp_driving)
+        self.results = {}
+        self.last_rendered = None  # (feature_3d, kp_source, kp_driving, _PendingFrame)
+
+    def submit(self, feature_3d, kp_source, kp_driving):
+        """warp_decode 대체: 입력을 큐에 쌓고 K개가 모이면 배치 실행"""
+        if self.deadline is not None:
+            self.deadline.on_frame()
+            out = self._submit(feature_3d, kp_source, kp_driving)
+            self.deadline.crops.append(out['out'])
+            return out
+        return self._submit(feature_3d, kp_source, kp_driving)
+
+    def _submit(self, feature_3d, kp_source, kp_driving):
+        self.stats['frames_total'] += 1
+        if self._can_reuse(feature_3d, kp_source, kp_driving):
+            self.stats['frames_skipped'] += 1
+            return {'out': self.last_rendered[3]}
+        
+        index = self.stats['frames_rendered']
+        self.stats['frames_rendered'] += 1
+        self.queue.append((index, feature_3d, kp_source, kp_driving))
+        pending = _PendingFrame(self, index)
+        self.last_rendered = (feature_3d, kp_source, kp_driving, pending)
+        if len(self.queue) >= self.batch_size:
+            self.flush()
+        return {'out': pending}
+
+    def _can_reuse(self, feature_3d, kp_source, kp_driving):
+        if self.last_rendered is None:
+            return False
+        last_feature_3d, last_kp_source, last_kp_driving, _ = self.last_rendered
+        # 소스가 바뀌면(소스 영상) 재사용하지 않음
+        if feature_3d is not last_feature_3d or kp_source is not last_kp_source:
+            return False
+        if self.deadline is not None and self.deadline.skip(self.stats['frames_total'] - 1):
+            return True
+        if self.reuse_eps <= 0:
+            return False
+        return (kp_driving - last_kp_driving).abs().max().item() < self.reuse_eps
+
+    def parse(self, out):
+        """parse_output 대체: 대기 중인 프레임은 그대로 넘김"""
+        if isinstance(out, _PendingFrame):
+            return [out]
+        return self.parse_output(out)
+
+    def result(self, index):
+        if index not in self.results:
+            self.flush()
+        return self.results[index]
+
+    def flush(self):
+        """큐에 쌓인 프레임을 배치로 실행 (메모리 부족 시 배치 크기를 절반으로 줄여 재시도)"""
+        while self.queue:
+            chunk = self.queue[:self.batch_size]
+            try:
+                frames = self._run(chunk)
+            except (RuntimeError, MemoryError) as e:
+                if not _is_out_of_memory(e) or self.batch_size == 1:
+                    raise
+                self.batch_size = max(1, self.batch_size // 2)
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+                print(f"⚠️  메모리 부족 - frame_batch_size를 {self.batch_size}(으)로 줄여 재시도")
+                continue
+            for (index, *_), frame in zip(chunk, frames):
+                self.results[index] = frame
+            del self.queue[:len(chunk)]
+
+    def _run(self, chunk):
+        feature_3d = torch.cat([item[1] for item in chunk], dim=0)
+        kp_source = torch.cat([item[2] for item in chunk], dim=0)
+        kp_driving = torch.cat([item[3] for item in chunk], dim=0)
+        out = self.warp_decode(feature_3d, kp_source, kp_driving)
+        return list(self.parse_output(out['out']))  # Kx3xHxW -> K개의 HxWx3 프레임
+
+
+class _PasteBackStage:
+    """paste_back 대체: 결과가 필요할 때까지 미루고, 정지 이미지 소스는 배치 단위로 블렌딩
+    
+    정지 이미지 소스는 crop->원본 변환과 마스크가 모든 프레임에서 같으므로
+    마스크 bbox, bbox 안의 마스크, (1 - mask) * source 배경을 작업당 한 번만 계산하고
+    프레임마다 bbox 영역만 NumPy로 블렌딩해 미리 할당한 출력 버퍼에 씀 (결과는 원본과 동일)
+    """
+
+    def __init__(self, paste_back, batch_size, static_source):
+        self.paste_back = paste_back  # 원본 함수
+        self.batch_size = max(1, int(batch_size))
+        self.static_source = static_source
+        self.items = []
+        self.results = {}
+        self.n_blended = 0
+        self.cache = None
+        self.enabled = True  # False면 블렌딩하지 않음 (마감 시간 때문에 paste-back 생략)
+
+    def submit(self, img_crop, M_c2o, img_ori, mask_ori):
+        if not self.static_source and not isinstance(img_crop, _PendingFrame):
+            return self.paste_back(img_crop, M_c2o, img_ori, mask_ori)
+        if self.static_source and self.items and img_crop is self.items[-1][0]:
+            # 재사용된 프레임: 같은 크롭이면 블렌딩 결과도 같음
+            return _PendingFrame(self, len(self.items) - 1)
+        index = len(self.items)
+        self.items.append((img_crop, M_c2o, img_ori, mask_ori))
+        if self.static_source and self.enabled and len(self.items) - self.n_blended >= self.batch_size:
+            self.flush()
+        return _PendingFrame(self, index)
+
+    def crop_of(self, frame):
+        """paste-back 생략 시: 이 단계의 결과 자리 대신 paste-back 전 크롭 프레임 반환"""
+        if isinstance(frame, _PendingFrame) and frame.stage is self:
+            return _resolve_frame(self.items[frame.index][0])
+        return _resolve_frame(frame)
+
+    def result(self, index):
+        if index not in self.results:
+            if self.static_source:
+                self.flush()
+            else:
+                img_crop, M_c2o, img_ori, mask_ori = self.items[index]
+                self.results[index] = self.paste_back(_resolve_frame(img_crop), M_c2o, img_ori, mask_ori)
+        return self.results[index]
+
+    def flush(self):
+        """대기 중인 프레임을 batch_size 단위로 블렌딩"""
+        while self.n_blended < len(self.items):
+            batch = self.items[self.n_blended:self.n_blended + self.batch_size]
+            for offset, frame in enumerate(self._blend_batch(batch)):
+                self.results[self.n_blended + offset] = frame
+            self.n_blended += len(batch)
+
+    def _prepare(self, M_c2o, img_ori, mask_ori):
+        """작업당 한 번: 마스크 bbox와 bbox 안의 마스크/배경 계산"""
+        rows = np.flatnonzero(mask_ori.any(axis=(1, 2)))
+        cols = np.flatnonzero(mask_ori.any(axis=(0, 2)))
+        self.cache = {'M_c2o': M_c2o, 'dsize': (img_ori.shape[1], img_ori.shape[0]), 'bbox': None}
+        if rows.size == 0:
+            return
+        y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        mask = mask_ori[y0:y1, x0:x1]
+        self.cache.update({
+            'bbox': (y0, y1, x0, x1),
+            'mask': mask,
+            'background': (1 - mask) * img_ori[y0:y1, x0:x1],
+        })
+
+    def _blend_batch(self, batch):
+        _, M_c2o, img_ori, mask_ori = batch[0]
+        if self.cache is None:
+            self._prepare(M_c2o, img_ori, mask_ori)
+        
+        # 마스크 밖은 원본 그대로이므로 source로 채운 버퍼에 bbox 영역만 덮어씀
+        out = np.empty((len(batch),) + img_ori.shape, dtype=np.uint8)
+        out[:] = img_ori
+        if self.cache['bbox'] is None:
+            return list(out)
+        
+        # warp는 원본과 같은 전체 크기로 수행 (OpenCV warpAffine은 출력 크기에 따라 보간 반올림이 달라짐)
+        y0, y1, x0, x1 = self.cache['bbox']
+        warped = np.empty((len(batch), y1 - y0, x1 - x0, img_ori.shape[2]), dtype=np.uint8)
+        for i, (img_crop, *_) in enumerate(batch):
+            warped[i] = _transform_img(_resolve_frame(img_crop), self.cache['M_c2o'], dsize=self.cache['dsize'])[y0:y1, x0:x1]
+        
+        blended = self.cache['mask'] * warped
+        blended += self.cache['background']
+        np.clip(blended, 0, 255, out=blended)
+        out[:, y0:y1, x0:x1] = blended
+        return list(out)
+
+
+def _track_landmarks(prev_gray, gray, lmk, smooth_alpha):
+    """이전 프레임 랜드마크를 LK optical flow로 현재 프레임에 전파
+    
+    Returns:
+        tuple: (전파된 랜드마크, 신뢰도 0~1 - forward-backward 검증을 통과한 점의 비율)
+    """
+    p0 = lmk.astype(np.float32).reshape(-1, 1, 2)
+    lk_params = dict(winSize=(21, 21), maxLevel=3,
+                     criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+    p1, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, p0, None, **lk_params)
+    p0_back, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, p1, None, **lk_params)
+    
+    fb_error = np.linalg.norm((p0 - p0_back).reshape(-1, 2), axis=1)
+    good = (status.ravel() == 1) & (status_back.ravel() == 1) & (fb_error < 1.0)
+    if not good.any():
+        return lmk, 0.0
+    
+    # 얼굴 전체의 이동(중앙값)을 따라가고, 점별 잔차는 smooth_alpha만큼만 반영해 떨림 억제
+    p0, p1 = p0.reshape(-1, 2), p1.reshape(-1, 2)
+    predicted = p0 + np.median(p1[good] - p0[good], axis=0)
+    tracked = np.where(good[:, None], p1, predicted)
+    return predicted + smooth_alpha * (tracked - predicted), float(good.mean())
+
+
+def crop_driving_video_tracked(cropper, driving_rgb_lst, detect_interval=10, min_confidence=0.8,
+                               smooth_alpha=0.5, stats=None, **kwargs):
+    """Cropper.crop_driving_video의 트래킹 버전
+    
+    원본은 매 프레임 랜드마크 모델을 실행함. 여기서는 detect_interval 프레임마다(키프레임)
+    랜드마크 모델을 실행하고, 그 사이는 LK optical flow로 랜드마크를 전파함.
+    트래킹 신뢰도가 min_confidence 아래로 떨어지면 얼굴 검출부터 다시 수행함.
+    
+    Args:
+        cropper: src.cropper.Cropper 인스턴스
+        driving_rgb_lst: 드라이빙 프레임 목록 (RGB)
+        detect_interval: 랜드마크 모델 실행 간격 (프레임 수)
+        min_confidence: 재검출 기준 트래킹 신뢰도 (0~1)
+        smooth_alpha: 점별 추적 결과 반영 비율 (1이면 스무딩 없음)
+        stats: 전달 시 검출/랜드마크/트래킹/얼굴 놓침 횟수를 기록할 dict
+        
+    Returns:
+        dict: 원본과 같은 형식 {'frame_crop_lst', 'lmk_crop_lst'} (입력 프레임마다 하나씩)
+        
+    Raises:
+        Exception: 얼굴을 한 번도 찾기 전에 얼굴이 없는 프레임이 나온 경우 (원본과 같음)
+    """
+    direction = kwargs.get("direction", "large-small")
+    crop_cfg = cropper.crop_cfg
+    counts = {'detect': 0, 'landmark': 0, 'track': 0, 'lost': 0}
+    
+    lmk, prev_gray, since_keyframe = None, None, 0
+    frame_rgb_lst, lmk_lst, bbox_lst = [], [], []
+    for idx, frame_rgb in enumerate(driving_rgb_lst):
+        gray = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2GRAY)
+        
+        if lmk is not None and since_keyframe < detect_interval:
+            tracked, confidence = _track_landmarks(prev_gray, gray, lmk, smooth_alpha)
+            if confidence >= min_confidence:
+                lmk = tracked
+                since_keyframe += 1
+                counts['track'] += 1
+            else:
+                lmk = None  # 트래킹 실패 - 얼굴 검출부터 다시
+        elif lmk is not None:
+            # 키프레임: 원본과 같이 이전 랜드마크를 기준으로 랜드마크 모델 실행
+            lmk = cropper.human_landmark_runner.run(frame_rgb, lmk)
+            since_keyframe = 1
+            counts['landmark'] += 1
+        
+        if lmk is None:
+            src_face = cropper.face_analysis_wrapper.get(
+                contiguous(frame_rgb[..., ::-1]),
+                flag_do_landmark_2d_106=True,
+                direction=direction,
+            )
+            counts['detect'] += 1
+            if len(src_face) == 0:
+                if not lmk_lst:
+                    # 원본과 같이 실패 (아직 참고할 랜드마크가 없음)
+                    raise Exception(f"No face detected in the frame #{idx}")
+                # 프레임을 빠뜨리면 모션 템플릿이 드라이빙 프레임 수보다 짧아지므로
+                # 마지막으로 찾은 랜드마크를 재사용하고 다음 프레임에서 다시 검출
+                print(f"⚠️  No face detected in the frame #{idx} - 이전 랜드마크 재사용")
+                counts['lost'] += 1
+                prev_gray = gray
+                lmk_lst.append(lmk_lst[-1])
+                frame_rgb_lst.append(frame_rgb)
+                continue
+            lmk = cropper.human_landmark_runner.run(frame_rgb, src_face[0].landmark_2d_106)
+            since_keyframe = 1
+            counts['landmark'] += 1
+        
+        prev_gray = gray
+        ret_bbox = parse_bbox_from_landmark(
+            lmk,
+            scale=crop_cfg.scale_crop_driving_video,
+            vx_ratio_crop_driving_video=crop_cfg.vx_ratio_crop_driving_video,
+            vy_ratio=crop_cfg.vy_ratio_crop_driving_video,
+        )["bbox"]
+        bbox_lst.append([ret_bbox[0, 0], ret_bbox[0, 1], ret_bbox[2, 0], ret_bbox[2, 1]])
+        lmk_lst.append(lmk)
+        frame_rgb_lst.append(frame_rgb)
+    
+    global_bbox = average_bbox_lst(bbox_lst)
+    frame_crop_lst, lmk_crop_lst = [], []
+    for frame_rgb, lmk in zip(frame_rgb_lst, lmk_lst):
+        ret_dct = crop_image_by_bbox(
+            frame_rgb,
+            global_bbox,
+            lmk=lmk,
+            dsize=kwargs.get("dsize", 512),
+            flag_rot=False,
+            borderValue=(0, 0, 0),
+        )
+        frame_crop_lst.append(ret_dct["img_crop"])
+        lmk_crop_lst.append(ret_dct["lmk_crop"])
+    
+    print(f"⚡ 드라이빙 얼굴 트래킹: 검출 {counts['detect']}회, 랜드마크 {counts['landmark']}회, "
+          f"트래킹 {counts['track']}회, 얼굴 놓침 {counts['lost']}회 / {len(driving_rgb_lst)} 프레임")
+    if stats is not None:
+        stats.update(counts)
+    
+    return {
+        "frame_crop_lst": frame_crop_lst,
+        "lmk_crop_lst": lmk_crop_lst,
+    }
+
+
+# images2video_ffmpeg로 넘기는 인코딩 옵션 (작업 옵션과 같은 이름)
+ENCODE_OPTION_KEYS = ('video_codec', 'video_crf', 'video_bitrate', 'video_preset', 'output_scale', 'pixel_format')
+
+# MP4 컨테이너에 재인코딩 없이 그대로 넣을 수 있는 오디오 코덱
+MP4_COPYABLE_AUDIO_CODECS = {'aac', 'mp3', 'alac', 'ac3', 'eac3'}
+
+
+def images2video_ffmpeg(images, wfp, fps=30, video_codec='libx264', video_crf=18, video_bitrate=None,
+                        video_preset=None, output_scale=1.0, pixel_format='yuv420p',
+                        audio_path=None, audio_copy=False):
+    """프레임 목록(RGB)을 ffmpeg 파이프로 인코딩하고, 오디오가 있으면 같은 패스에서 mux
+    
+    기본값은 원본 images2video(libx264, crf 18, yuv420p)와 같음.
+    video_bitrate를 지정하면 CRF 대신 비트레이트로 인코딩함 (CRF를 지원하지 않는 인코더용).
+    fps는 Fraction도 가능 (ffmpeg에 "25/3" 형식으로 전달).
+    """
+    height, width = images[0].shape[:2]
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+    ]
+    if audio_path:
+        cmd += ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0',
+                '-c:a', 'copy' if audio_copy else 'aac', '-shortest']
+    cmd += [
+        # yuv420p 등 chroma subsampling 포맷은 짝수 해상도가 필요
+        '-vf', f'scale=trunc(iw*{output_scale}/2)*2:trunc(ih*{output_scale}/2)*2',
+        '-c:v', video_codec, '-pix_fmt', pixel_format,
+    ]
+    if video_bitrate:
+        cmd += ['-b:v', str(video_bitrate)]
+    else:
+        cmd += ['-crf', str(video_crf)]
+    if video_preset:
+        cmd += ['-preset', video_preset]
+    cmd += ['-movflags', '+faststart', wfp]
+    
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    pipe_closed = False
+    try:
+        for frame in images:
+            process.stdin.write(np.ascontiguousarray(frame).tobytes())
+    except OSError:
+        # ffmpeg가 먼저 종료됨 (잘못된 코덱/픽셀 포맷 등) - 원인은 아래에서 stderr로 보고
+        pipe_closed = True
+    finally:
+        try:
+            process.stdin.close()
+        except OSError:
+            pipe_closed = True
+        stderr = process.stderr.read()
+        process.wait()
+    if process.returncode != 0 or pipe_closed:
+        raise RuntimeError(f"ffmpeg 인코딩 실패 (exit {process.returncode}): {stderr.decode('utf-8', errors='ignore')}")
+    return wfp
+
+
+def _probe_audio_codec(path):
+    """첫 번째 오디오 스트림의 코덱 이름 (없으면 None)"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+         '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', path],
+        capture_output=True, text=True,
+    )
+    return result.stdout.strip() or None
+
+
+class _AudioPrefetch:
+    """결과 영상에 넣을 오디오를 추론과 병렬로 미리 추출
+    
+    오디오 소스 선택 규칙은 원본 파이프라인(audio_priority)과 같음
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.audio_path = None
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._result = self._extract()
+        except Exception as e:
+            self._error = e
+
+    def _extract(self):
+        args = self.args
+        source_has_audio = is_video(args.source) and has_audio_stream(args.source)
+        driving_has_audio = not is_template(args.driving) and has_audio_stream(args.driving)
+        if not (source_has_audio or driving_has_audio):
+            return None
+        
+        use_driving = (driving_has_audio and args.audio_priority == 'driving') or not source_has_audio
+        audio_from = args.driving if use_driving else args.source
+        os.makedirs(args.output_dir, exist_ok=True)
+        # mka는 어떤 오디오 코덱이든 그대로 담을 수 있음
+        self.audio_path = osp.join(args.output_dir, f"{osp.splitext(osp.basename(audio_from))[0]}_audio.mka")
+        subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-i', audio_from,
+             '-map', '0:a:0', '-vn', '-c:a', 'copy', self.audio_path],
+            capture_output=True, check=True,
+        )
+        return self.audio_path, _probe_audio_codec(self.audio_path) in MP4_COPYABLE_AUDIO_CODECS
+
+    def result(self):
+        """(오디오 파일 경로, 스트림 복사 가능 여부) 또는 None"""
+        self._thread.join()
+        if self._error is not None:
+            print(f"⚠️  오디오 미리 추출 실패 - 원본 방식으로 오디오 추가: {self._error}")
+            return None
+        return self._result
+
+    def cleanup(self):
+        self._thread.join()
+        if self.audio_path and osp.exists(self.audio_path):
+            os.remove(self.audio_path)
 
 
 class FastLivePortraitPipeline(LivePortraitPipeline):
     """concat 처리를 생략한 빠른 LivePortrait 파이프라인"""
     
-    def __init__(self, inference_cfg, crop_cfg, disable_concat=True):
+    def __init__(self, inference_cfg, crop_cfg, disable_concat=True, frame_batch_size=1,
+                 driving_track_interval=1, driving_track_min_confidence=0.8, motion_reuse_eps=0.0,
+                 driving_max_fps=None, driving_max_dim=None, encode_options=None, deadline=None):
         super().__init__(inference_cfg, crop_cfg)
+        self.configure(disable_concat, frame_batch_size, driving_track_interval, driving_track_min_confidence,
+                       motion_reuse_eps, driving_max_fps, driving_max_dim, encode_options, deadline)
+    
+    def configure(self, disable_concat=True, frame_batch_size=1, driving_track_interval=1,
+                  driving_track_min_confidence=0.8, motion_reuse_eps=0.0, driving_max_fps=None,
+                  driving_max_dim=None, encode_options=None, deadline=None):
+        """작업별 최적화 옵션 설정 (모델을 다시 로드하지 않고 파이프라인을 재사용할 때도 호출)"""
         self.disable_concat = disable_concat
+        self.frame_batch_size = max(1, int(frame_batch_size))
+        self.driving_track_interval = max(1, int(driving_track_interval))
+        self.driving_track_min_confidence = driving_track_min_confidence
+        self.motion_reuse_eps = motion_reuse_eps
+        self.driving_max_fps = driving_max_fps
+        self.driving_max_dim = driving_max_dim  # 드라이빙 프레임 긴 변 최대 크기 (작업 수락 다운스케일)
+        self.encode_options = encode_options or {}  # images2video_ffmpeg 인코딩 옵션
+        self.deadline = deadline  # _DeadlineController (deadline_ms 지정 시)
+        self.last_run_stats = {}  # 마지막 execute의 프레임/트래킹 통계
     
     def execute(self, args):
-        """원본 execute를 호출하되, concat 처리를 조건부로 스킵"""
-        # 일시적으로 concat을 비활성화하기 위한 monkey patching
+        """원본 execute를 호출하되, 활성화된 최적화에 맞춰 내부 함수들을 임시로 교체"""
+        self.last_run_stats = {}
+        # 결과 영상에 넣을 오디오는 추론과 병렬로 미리 추출
+        audio_prefetch = None if is_image(args.driving) else _AudioPrefetch(args)
+        patches = self._build_patches(args, audio_prefetch)
+        originals = []
+        for owner, name, replacement in patches:
+            originals.append((owner, name, getattr(owner, name), name in vars(owner)))
+            setattr(owner, name, replacement)
+        
+        try:
+            # 원본 execute 실행
+            result = super().execute(args)
+            if self.deadline is not None:
+                self.last_run_stats['deadline'] = self.deadline.stats()
+            return result
+        except _DeadlineExceeded:
+            return self._write_partial_video(args)
+        finally:
+            # 원본 함수 복원
+            for owner, name, original, had_own_attr in reversed(originals):
+                if had_own_attr:
+                    setattr(owner, name, original)
+                else:
+                    delattr(owner, name)
+            if audio_prefetch is not None:
+                audio_prefetch.cleanup()
+    
+    def _write_partial_video(self, args):
+        """마감 시간 초과: 지금까지 렌더링한 프레임만으로 결과 영상 저장 (패치가 적용된 상태에서 호출)"""
+        deadline = self.deadline
+        n_frames = len(deadline.crops)
+        frames = deadline.pasted[:n_frames] if deadline.pasted else deadline.crops
+        if not frames:
+            raise RuntimeError(f"마감 시간({deadline.deadline_ms}ms) 안에 렌더링된 프레임이 없습니다")
+        print(f"⏱️  마감 시간 초과 - 렌더링된 {len(frames)}/{deadline.n_frames or '?'} 프레임으로 부분 영상 저장")
+        
+        # 원본 파이프라인과 같은 결과 파일 이름
+        wfp = osp.join(args.output_dir, f"{osp.splitext(osp.basename(args.source))[0]}--"
+                                         f"{osp.splitext(osp.basename(args.driving))[0]}.mp4")
+        lp_pipeline_module.images2video(frames, wfp=wfp, fps=deadline.fps or 25)
+        self.last_run_stats['deadline'] = deadline.stats(partial=True, frames_written=len(frames))
+        return wfp, wfp
+    
+    def _build_patches(self, args, audio_prefetch=None):
+        """(대상 객체, 속성 이름, 대체 함수) 목록 생성"""
+        patches = []
+        
         if self.disable_concat:
             # concat_frames 함수를 임시로 무력화
             import src.utils.video as video_utils
-            original_concat_frames = video_utils.concat_frames
             
             def dummy_concat_frames(driving_image_lst, source_image_lst, I_p_lst):
                 """concat을 생략하고 결과만 반환"""
                 print("⚡ concat 처리 생략됨 (속도 최적화)")
                 return I_p_lst  # 결과 프레임만 반환
             
-            # 일시적으로 concat_frames 교체
-            video_utils.concat_frames = dummy_concat_frames
+            patches.append((video_utils, 'concat_frames', dummy_concat_frames))
+        
+        if self.driving_track_interval > 1:
+            # 드라이빙 크롭 시 매 프레임 랜드마크 대신 키프레임 + optical flow 트래킹
+            cropper = self.cropper
             
-            try:
-                # 원본 execute 실행
-                result = super().execute(args)
-                return result
-            finally:
-                # 원본 함수 복원
-                video_utils.concat_frames = original_concat_frames
-        else:
-            # concat 활성화된 경우 원본 그대로 실행
-            return super().execute(args)
+            def crop_driving_video(driving_rgb_lst, **kw):
+                return crop_driving_video_tracked(cropper, driving_rgb_lst,
+                                                  detect_interval=self.driving_track_interval,
+                                                  min_confidence=self.driving_track_min_confidence,
+                                                  stats=self.last_run_stats.setdefault('driving_tracking', {}),
+                                                  **kw)
+            
+            patches.append((cropper, 'crop_driving_video', crop_driving_video))
+        
+        deadline = self.deadline
+        driving_fps = {}  # 프레임을 건너뛴 뒤의 정확한 FPS (원본 파이프라인은 int()로 잘라서 씀)
+        if self.driving_max_fps or self.driving_max_dim or deadline is not None:
+            # 드라이빙 프레임을 일정 간격으로 건너뛰어 FPS를 driving_max_fps 이하로 낮추고 (영상 길이는 유지)
+            # 긴 변이 driving_max_dim보다 크면 축소 (마감 시간 지정 시 프레임 수/FPS 기록)
+            original_get_fps = lp_pipeline_module.get_fps
+            original_load_video = lp_pipeline_module.load_video
+            
+            def frame_step(path):
+                if not self.driving_max_fps:
+                    return 1
+                return max(1, math.ceil(original_get_fps(path) / self.driving_max_fps))
+            
+            def downscale(frame):
+                h, w = frame.shape[:2]
+                ratio = self.driving_max_dim / max(h, w)
+                if ratio >= 1:
+                    return frame
+                # 짝수 크기 유지 (yuv420p 인코딩)
+                size = (max(2, int(w * ratio) // 2 * 2), max(2, int(h * ratio) // 2 * 2))
+                return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            
+            def get_fps(path, *a, **kw):
+                fps = original_get_fps(path, *a, **kw)
+                if path != args.driving:
+                    return fps
+                step = frame_step(path)
+                if step > 1:
+                    # 25/3 = 8.33처럼 정수가 아니므로 인코딩에는 유리수 그대로 전달 (영상 길이/오디오 싱크 유지)
+                    driving_fps['exact'] = Fraction(fps).limit_denominator(1001) / step
+                    fps = float(driving_fps['exact'])
+                if deadline is not None:
+                    deadline.fps = fps
+                return fps
+            
+            def load_video(path, *a, **kw):
+                frames = original_load_video(path, *a, **kw)
+                if path != args.driving:
+                    return frames
+                frames = frames[::frame_step(path)]
+                if self.driving_max_dim:
+                    frames = [downscale(frame) for frame in frames]
+                if deadline is not None:
+                    deadline.n_frames = len(frames)
+                return frames
+            
+            patches += [
+                (lp_pipeline_module, 'get_fps', get_fps),
+                (lp_pipeline_module, 'load_video', load_video),
+            ]
+        
+        # 드라이빙이 이미지면 결과도 한 장이므로 지연/배치 처리 불필요
+        if is_image(args.driving):
+            return patches
+        
+        wrapper = self.live_portrait_wrapper
+        if self.frame_batch_size > 1 or self.motion_reuse_eps > 0 or deadline is not None:
+            print(f"⚡ 프레임 배치 추론 활성화 (frame_batch_size: {self.frame_batch_size}, "
+                  f"motion_reuse_eps: {self.motion_reuse_eps})")
+            decoder = _BatchedWarpDecoder(wrapper, self.frame_batch_size, reuse_eps=self.motion_reuse_eps,
+                                          stats=self.last_run_stats, deadline=deadline)
+            patches += [
+                (wrapper, 'warp_decode', decoder.submit),
+                (wrapper, 'parse_output', decoder.parse),
+            ]
+        
+        # 정지 이미지 소스는 paste-back 변환/마스크를 캐시하고 배치로 블렌딩
+        static_source = is_image(args.source)
+        if deadline is not None:
+            deadline.static_source = static_source
+        paste_back_stage = None
+        if self.frame_batch_size > 1 or self.motion_reuse_eps > 0 or static_source or deadline is not None:
+            paste_back_stage = _PasteBackStage(lp_pipeline_module.paste_back,
+                                               max(self.frame_batch_size, PASTEBACK_BATCH_SIZE),
+                                               static_source)
+            original_concat_frames = lp_pipeline_module.concat_frames
+            
+            def concat_frames(driving_image_lst, source_image_lst, I_p_lst):
+                return original_concat_frames(driving_image_lst, source_image_lst,
+                                              [_resolve_frame(f) for f in I_p_lst])
+            
+            def paste_back(*a, **kw):
+                frame = paste_back_stage.submit(*a, **kw)
+                if deadline is not None:
+                    deadline.pasted.append(frame)
+                    paste_back_stage.enabled = deadline.pasteback
+                return frame
+            
+            patches += [
+                (lp_pipeline_module, 'paste_back', paste_back),
+                (lp_pipeline_module, 'concat_frames', concat_frames),
+            ]
+        
+        # 비디오 인코딩과 오디오 mux를 ffmpeg 한 번으로 처리
+        write_video = functools.partial(images2video_ffmpeg, **self.encode_options)
+        original_add_audio_to_video = lp_pipeline_module.add_audio_to_video
+        muxed_paths = set()
+        
+        def images2video(images, wfp, **kw):
+            audio = audio_prefetch.result() if audio_prefetch is not None else None
+            if audio is not None:
+                kw.update(audio_path=audio[0], audio_copy=audio[1])
+                muxed_paths.add(wfp)
+            if 'exact' in driving_fps:
+                kw['fps'] = driving_fps['exact']
+            if deadline is not None and deadline.output_scale:
+                kw['output_scale'] = min(self.encode_options.get('output_scale', 1.0), deadline.output_scale)
+            if deadline is not None and not deadline.pasteback and paste_back_stage is not None:
+                # paste-back을 생략했으면 모든 프레임을 크롭 결과로 통일 (프레임 크기가 섞이지 않도록)
+                return write_video([paste_back_stage.crop_of(f) for f in images], wfp, **kw)
+            return write_video([_resolve_frame(f) for f in images], wfp, **kw)
+        
+        def add_audio_to_video(silent_video_path, audio_video_path, output_video_path):
+            if silent_video_path in muxed_paths:
+                # 이미 오디오가 들어가 있으므로 이름만 맞춤 (원본은 이후 output -> silent로 다시 replace)
+                os.replace(silent_video_path, output_video_path)
+            else:
+                original_add_audio_to_video(silent_video_path, audio_video_path, output_video_path)
+        
+        patches += [
+            (lp_pipeline_module, 'images2video', images2video),
+            (lp_pipeline_module, 'add_audio_to_video', add_audio_to_video),
+        ]
+        
+        return patches
 
 
 def partial_fields(target_class, kwargs):
@@ -72,8 +846,13 @@ def fast_check_ffmpeg():
 class LivePortraitConverter:
     """LivePortrait를 사용한 이미지-영상 변환 클래스"""
     
-    def __init__(self):
-        """컨버터 초기화"""
+    def __init__(self, reuse_pipeline=False):
+        """컨버터 초기화
+        
+        Args:
+            reuse_pipeline: True면 모델 로딩에 영향을 주는 설정이 같은 동안 파이프라인을 재사용
+                (여러 작업을 연속 처리하는 배치 모드용)
+        """
         print("LivePortraitConverter 초기화 중...")
         
         # FFmpeg 경로 설정
@@ -87,8 +866,35 @@ class LivePortraitConverter:
                 "FFmpeg is not installed. Please install FFmpeg (including ffmpeg and ffprobe) before running this script. https://ffmpeg.org/download.html"
             )
         
+        self.last_stats = {}  # 마지막 변환의 프레임/트래킹 통계
+        self.reuse_pipeline = reuse_pipeline
+        self._pipeline = None
+        self._cached_key = None  # 캐시된 파이프라인의 _pipeline_key
         print("LivePortraitConverter 초기화 완료")
     
+    @staticmethod
+    def _pipeline_key(args):
+        """모델/디텍터 로딩 시점에 정해지는 설정 - 이 값이 같으면 파이프라인 재사용 가능"""
+        return (args.device_id, args.flag_force_cpu, args.flag_use_half_precision, args.det_thresh,
+                getattr(args, 'flag_do_torch_compile', False))
+    
+    def _get_pipeline(self, args, inference_cfg, crop_cfg, **options):
+        """FastLivePortraitPipeline 생성 (reuse_pipeline이면 캐시된 파이프라인에 설정만 교체)"""
+        key = self._pipeline_key(args)
+        if self.reuse_pipeline and self._pipeline is not None and self._cached_key == key:
+            print("♻️  LivePortraitPipeline 재사용 (모델 로딩 생략)")
+            pipeline = self._pipeline
+            # 원본 execute는 이 두 설정 객체에서 작업 설정을 읽음
+            pipeline.live_portrait_wrapper.inference_cfg = inference_cfg
+            pipeline.cropper.crop_cfg = crop_cfg
+            pipeline.configure(**options)
+            return pipeline
+        
+        pipeline = FastLivePortraitPipeline(inference_cfg=inference_cfg, crop_cfg=crop_cfg, **options)
+        if self.reuse_pipeline:
+            self._pipeline, self._cached_key = pipeline, key
+        return pipeline
+    
     def convert_image_video_to_video(self, 
                                    source_image_path, 
                                    driving_video_path,
@@ -100,13 +906,19 @@ class LivePortraitConverter:
         Args:
             source_image_path: 소스 이미지 파일 경로
             driving_video_path: 드라이빙 영상 파일 경로
-            output_dir: 출력 디렉토리 (기본값: 임시 디렉토리)
-            **kwargs: 추가 설정 옵션들
+            output_dir: 출력 디렉토리 (기본값: 임시 저장소의 새 디렉토리 - /dev/shm일 수 있으므로
+                결과를 옮긴 뒤 호출한 쪽에서 os.path.dirname(결과 경로)를 삭제해야 함)
+            **kwargs: 추가 설정 옵션들 (quality: "preview" | "final" 프리셋,
+                deadline_ms: 이 시간 안에 끝나도록 품질을 단계적으로 낮추고, 넘기면 부분 영상 반환)
             
         Returns:
             str: 생성된 비디오 파일 경로
         """
         
+        # 마감 시간은 모델 로딩을 포함해 변환 시작 시점부터 계산
+        deadline_ms = kwargs.get('deadline_ms')
+        deadline = _DeadlineController(deadline_ms) if deadline_ms else None
+        
         print(f"LivePortrait 변환 시작:")
         print(f"  - 소스 이미지: {source_image_path}")
         print(f"  - 드라이빙 영상: {driving_video_path}")
@@ -117,9 +929,21 @@ class LivePortraitConverter:
         if not osp.exists(driving_video_path):
             raise FileNotFoundError(f"driving info not found: {driving_video_path}")
         
-        # 출력 디렉토리 설정
-        if output_dir is None:
-            output_dir = tempfile.mkdtemp()
+        # 품질 프리셋 적용 (preview: 빠른 미리보기)
+        quality = kwargs.get('quality', 'final')
+        if quality not in QUALITY_PRESETS:
+            raise ValueError(f"지원하지 않는 quality입니다: {quality} (preview 또는 final)")
+        preset = QUALITY_PRESETS[quality]
+        if kwargs.get('driving_max_fps') and preset.get('driving_max_fps'):
+            # 작업 수락 단계에서 더 낮은 FPS를 정했으면 그 값을 유지
+            preset = {**preset, 'driving_max_fps': min(kwargs['driving_max_fps'], preset['driving_max_fps'])}
+        kwargs = {**kwargs, **preset}
+        
+        # 출력 디렉토리 설정 (지정하지 않으면 RAM 기반 임시 저장소, 결과 영상 + 추출한 오디오 크기 추정)
+        owns_output_dir = output_dir is None
+        if owns_output_dir:
+            output_dir = get_scratch_storage().mkdtemp(
+                prefix='liveportrait_output_', size_hint=2 * os.path.getsize(driving_video_path) + 64 * 1024 * 1024)
         os.makedirs(output_dir, exist_ok=True)
         
         # ArgumentConfig 생성 (inference.py와 동일한 방식)
@@ -174,14 +998,28 @@ class LivePortraitConverter:
             save_concat = kwargs.get('flag_save_concat_video', False)
             print(f"LivePortraitPipeline 초기화 중... (concat: {'활성화' if save_concat else '비활성화'})")
             
-            live_portrait_pipeline = FastLivePortraitPipeline(
-                inference_cfg=inference_cfg,
-                crop_cfg=crop_cfg,
-                disable_concat=not save_concat  # concat 비활성화로 속도 향상
+            live_portrait_pipeline = self._get_pipeline(
+                args,
+                inference_cfg,
+                crop_cfg,
+                disable_concat=not save_concat,  # concat 비활성화로 속도 향상
+                frame_batch_size=kwargs.get('frame_batch_size', 1),  # K개 프레임 단위 배치 추론
+                driving_track_interval=kwargs.get('driving_track_interval', 1),  # 1이면 매 프레임 랜드마크
+                driving_track_min_confidence=kwargs.get('driving_track_min_confidence', 0.8),
+                motion_reuse_eps=kwargs.get('motion_reuse_eps', 0.0),  # 0이면 프레임 재사용 안 함
+                driving_max_fps=kwargs.get('driving_max_fps'),
+                driving_max_dim=kwargs.get('driving_max_dim'),
+                encode_options={k: kwargs[k] for k in ENCODE_OPTION_KEYS if k in kwargs},
+                deadline=deadline
             )
             
             print("LivePortrait 실행 중...")
             live_portrait_pipeline.execute(args)
+            self.last_stats = dict(live_portrait_pipeline.last_run_stats)
+            if self.last_stats.get('frames_skipped'):
+                print(f"⚡ 저움직임 구간 프레임 재사용: {self.last_stats['frames_skipped']}/{self.last_stats['frames_total']} 프레임")
+            if self.last_stats.get('deadline', {}).get('degradations'):
+                print(f"⏱️  적용된 품질 저하: {', '.join(self.last_stats['deadline']['degradations'])}")
             
             # 결과 파일 경로 찾기 (일반적으로 output_dir에 생성됨)
             output_files = [f for f in os.listdir(output_dir) if f.endswith(('.mp4', '.avi', '.mov'))]
@@ -195,6 +1033,8 @@ class LivePortraitConverter:
             
         except Exception as e:
             print(f"LivePortrait 변환 중 오류: {str(e)}")
+            if owns_output_dir:
+                shutil.rmtree(output_dir, ignore_errors=True)  # 실패하면 결과가 없으므로 임시 디렉토리 정리
             raise e
 
 
@@ -237,10 +1077,9 @@ def load_image_from_input(image_input):
         elif image.mode != 'RGB':
             image = image.convert('RGB')
         
-        # 임시 파일로 저장
-        temp_dir = tempfile.gettempdir()
-        temp_filename = f"source_image_{hash(image_input) % 100000}.jpg"
-        temp_path = os.path.join(temp_dir, temp_filename)
+        # 임시 저장소에 저장 (RGB 원본 크기를 상한으로 추정)
+        temp_path = get_scratch_storage().new_file(suffix='.jpg', prefix='source_image_',
+                                                   size_hint=image.width * image.height * 3)
         
         image.save(temp_path, 'JPEG', quality=95)
         
@@ -280,13 +1119,8 @@ def load_video_from_input(video_input):
             # 일반 Base64 문자열
             video_data = base64.b64decode(video_input)
         
-        # 임시 파일로 저장
-        temp_dir = tempfile.gettempdir()
-        temp_filename = f"driving_video_{hash(video_input) % 100000}.mp4"
-        temp_path = os.path.join(temp_dir, temp_filename)
-        
-        with open(temp_path, 'wb') as f:
-            f.write(video_data)
+        # 임시 저장소에 저장
+        temp_path = get_scratch_storage().write_bytes(video_data, suffix='.mp4', prefix='driving_video_')
         
         print(f"영상 저장 완료: {temp_path}")
         return temp_path
@@ -296,10 +1130,173 @@ def load_video_from_input(video_input):
         raise ValueError(f"영상을 로드할 수 없습니다: {str(e)}")
 
 
+def motion_template_path(driving_path):
+    """원본 파이프라인이 드라이빙 영상 옆에 저장하는 모션 템플릿(.pkl) 경로
+    
+    임시 드라이빙 영상을 지울 때 함께 지워야 함 (긴 영상은 수십 MB)
+    """
+    return osp.splitext(driving_path)[0] + '.pkl'
+
+
 # 이전 버전과의 호환성을 위한 alias
 ImageToVideoConverter = LivePortraitConverter
 
 
+def _prepare_inputs(source, driving):
+    """소스/드라이빙 입력을 로컬 파일 경로로 변환 (URL/Base64는 임시 파일로 저장)
+    
+    Returns:
+        tuple: (소스 이미지 경로, 드라이빙 영상 경로, 작업 후 지울 임시 파일 목록)
+    """
+    temp_paths = []
+    if source.startswith(('http', 'data:')):
+        source_path = load_image_from_input(source)
+        temp_paths.append(source_path)
+    else:
+        if not osp.exists(source):
+            raise FileNotFoundError(f"소스 이미지를 찾을 수 없습니다: {source}")
+        source_path = source
+    
+    try:
+        if driving.startswith(('http', 'data:')):
+            driving_path = load_video_from_input(driving)
+            temp_paths += [driving_path, motion_template_path(driving_path)]
+        else:
+            if not osp.exists(driving):
+                raise FileNotFoundError(f"드라이빙 영상을 찾을 수 없습니다: {driving}")
+            driving_path = driving
+    except Exception:
+        # 호출자는 임시 파일 목록을 받지 못하므로 이미 받은 소스 이미지를 여기서 정리
+        for path in temp_paths:
+            if osp.exists(path):
+                os.remove(path)
+        raise
+    return source_path, driving_path, temp_paths
+
+
+# manifest 행에서 작업 설정이 아닌 키 (나머지 키는 convert_image_video_to_video kwargs로 전달)
+MANIFEST_RESERVED_KEYS = ('id', 'source', 'driving', 'output')
+
+
+def _parse_csv_value(value):
+    """CSV 셀 값을 JSON으로 해석 (숫자/불리언), 안 되면 문자열 그대로"""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def load_manifest(path):
+    """jsonl 또는 csv 작업 목록 읽기
+    
+    각 행은 source, driving(필수)과 id, output(선택) 및 CLI 설정을 덮어쓸 kwargs
+    (예: driving_multiplier, quality)로 구성됨. id가 없으면 행 번호를 사용함.
+    """
+    rows = []
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            for row in csv.DictReader(f):
+                rows.append({k: _parse_csv_value(v) for k, v in row.items() if v not in (None, '')})
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    
+    for line_no, row in enumerate(rows, 1):
+        if not row.get('source') or not row.get('driving'):
+            raise ValueError(f"manifest {line_no}번째 행에 source 또는 driving이 없습니다")
+        row['id'] = str(row.get('id', line_no))
+        row['source'], row['driving'] = str(row['source']), str(row['driving'])
+    return rows
+
+
+def _completed_manifest_ids(report_path):
+    """리포트에서 마지막 상태가 success인 행 id (재실행 시 건너뜀)
+    
+    기록 중 중단되어 잘린 줄은 건너뜀 (해당 행은 완료되지 않은 것으로 보고 다시 처리)
+    """
+    status = {}
+    if osp.exists(report_path):
+        with open(report_path, encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    status[record['id']] = record['status']
+                except (ValueError, KeyError, TypeError):
+                    print(f"⚠️  리포트 {line_no}번째 줄을 읽을 수 없어 건너뜀: {line.strip()[:80]}")
+    return {row_id for row_id, row_status in status.items() if row_status == 'success'}
+
+
+def run_manifest(args, base_kwargs):
+    """manifest의 작업들을 모델을 한 번만 로드한 컨버터로 연속 처리
+    
+    현재 작업을 변환하는 동안 다음 작업의 입력(URL/Base64)을 백그라운드 스레드에서 미리 받고,
+    행마다 상태와 소요 시간을 리포트(jsonl)에 추가함. 다시 실행하면 이미 성공한 행은 건너뜀.
+    
+    Returns:
+        int: 실패한 작업 수
+    """
+    rows = load_manifest(args.manifest)
+    os.makedirs(args.output, exist_ok=True)
+    report_path = args.report or osp.join(args.output, 'manifest_report.jsonl')
+    completed = _completed_manifest_ids(report_path)
+    pending = [row for row in rows if row['id'] not in completed]
+    print(f"📋 manifest: 전체 {len(rows)}개, 완료 {len(rows) - len(pending)}개 건너뜀, {len(pending)}개 처리")
+    print(f"📝 리포트: {report_path}")
+    if not pending:
+        return 0
+    
+    converter = LivePortraitConverter(reuse_pipeline=True)
+    n_failed = 0
+    with ThreadPoolExecutor(max_workers=1) as prefetcher, open(report_path, 'a', encoding='utf-8') as report:
+        next_inputs = prefetcher.submit(_prepare_inputs, pending[0]['source'], pending[0]['driving'])
+        for i, row in enumerate(pending):
+            row_start = time.perf_counter()
+            inputs = next_inputs
+            next_inputs = None
+            if i + 1 < len(pending):
+                # 현재 작업을 변환하는 동안 다음 작업 입력 준비
+                next_inputs = prefetcher.submit(_prepare_inputs, pending[i + 1]['source'], pending[i + 1]['driving'])
+            
+            print(f"\n▶️  [{i + 1}/{len(pending)}] {row['id']}")
+            record = {'id': row['id'], 'status': 'error'}
+            temp_paths = []
+            try:
+                source_path, driving_path, temp_paths = inputs.result()
+                record['input_wait_seconds'] = round(time.perf_counter() - row_start, 3)
+                
+                kwargs = {**base_kwargs, **{k: v for k, v in row.items() if k not in MANIFEST_RESERVED_KEYS}}
+                convert_start = time.perf_counter()
+                output_path = converter.convert_image_video_to_video(
+                    source_image_path=source_path,
+                    driving_video_path=driving_path,
+                    output_dir=row.get('output') or osp.join(args.output, row['id']),
+                    **kwargs
+                )
+                record.update({
+                    'status': 'success',
+                    'output_path': output_path,
+                    'convert_seconds': round(time.perf_counter() - convert_start, 3),
+                    'frames_total': converter.last_stats.get('frames_total'),
+                })
+            except Exception as e:
+                n_failed += 1
+                record['error'] = str(e)
+                print(f"❌ [{row['id']}] 실패: {e}")
+            
+            # 임시 입력 정리
+            for path in temp_paths:
+                if osp.exists(path):
+                    os.remove(path)
+            
+            record['total_seconds'] = round(time.perf_counter() - row_start, 3)
+            report.write(json.dumps(record, ensure_ascii=False) + '\n')
+            report.flush()
+    
+    print(f"\n📋 manifest 완료: 성공 {len(pending) - n_failed}개, 실패 {n_failed}개")
+    return n_failed
+
+
 def main():
     """CLI 메인 함수"""
     import argparse
@@ -323,6 +1320,11 @@ def main():
   python action.py -s "data:image/jpeg;base64,/9j/4AAQ..." \\
     -d "https://example.com/driving.mp4" -o output/
 
+  # 배치 모드 (모델 한 번 로드, 행마다 output/<id>/에 저장, 재실행 시 완료된 행 건너뜀)
+  python action.py --manifest jobs.jsonl -o output/
+  # jobs.jsonl: {"id": "a", "source": "a.jpg", "driving": "d.mp4", "driving_multiplier": 1.2}
+  # jobs.csv:   id,source,driving,quality
+
 파일 형식:
   소스 이미지: JPG, JPEG, PNG
   드라이빙 영상: MP4, AVI, MOV
@@ -330,13 +1332,19 @@ def main():
     )
     
     # 필수 인자
-    parser.add_argument('-s', '--source', required=True,
+    parser.add_argument('-s', '--source',
                        help='소스 이미지 파일 경로, URL, 또는 Base64 문자열')
-    parser.add_argument('-d', '--driving', required=True,
+    parser.add_argument('-d', '--driving',
                        help='드라이빙 영상 파일 경로, URL, 또는 Base64 문자열')
     parser.add_argument('-o', '--output', required=True,
                        help='출력 디렉토리')
     
+    # 배치 모드
+    parser.add_argument('--manifest', default=None,
+                       help='작업 목록 파일 (jsonl 또는 csv) - 지정 시 -s/-d 대신 각 행을 연속 처리')
+    parser.add_argument('--report', default=None,
+                       help='manifest 행별 상태/소요 시간 리포트 경로 (기본값: <output>/manifest_report.jsonl)')
+    
     # LivePortrait 설정
     parser.add_argument('--driving-option', choices=['expression-friendly', 'pose-friendly'],
                        default='expression-friendly',
@@ -346,10 +1354,26 @@ def main():
     parser.add_argument('--animation-region', choices=['exp', 'pose', 'lip', 'eyes', 'all'],
                        default='all',
                        help='애니메이션 영역 (기본값: all)')
+    parser.add_argument('--quality', choices=['preview', 'final'], default='final',
+                       help='품질 프리셋 - preview는 FPS/해상도를 낮추고 paste-back을 생략한 빠른 미리보기 (기본값: final)')
     parser.add_argument('--audio-priority', choices=['source', 'driving'],
                        default='driving',
                        help='오디오 우선순위 (기본값: driving)')
     
+    # 출력 인코딩 설정
+    parser.add_argument('--video-codec', default='libx264',
+                       help='비디오 인코더 (기본값: libx264)')
+    parser.add_argument('--video-crf', type=int, default=18,
+                       help='CRF 품질 값 (기본값: 18)')
+    parser.add_argument('--video-bitrate', default=None,
+                       help='비트레이트 (예: 2M) - 지정 시 CRF 대신 사용')
+    parser.add_argument('--video-preset', default=None,
+                       help='인코더 preset (예: veryfast, medium)')
+    parser.add_argument('--output-scale', type=float, default=1.0,
+                       help='출력 해상도 배율 (기본값: 1.0)')
+    parser.add_argument('--pixel-format', default='yuv420p',
+                       help='출력 픽셀 포맷 (기본값: yuv420p)')
+    
     # 플래그 옵션들
     parser.add_argument('--no-half-precision', action='store_true',
                        help='반정밀도(FP16) 비활성화')
@@ -371,6 +1395,16 @@ def main():
                        help='비교 영상(concat) 생성 비활성화 - 처리 속도 향상')
     parser.add_argument('--save-concat', action='store_true',
                        help='비교 영상(concat) 생성 활성화 - 드라이빙+소스+결과 나란히 보기')
+    parser.add_argument('--frame-batch-size', type=int, default=1,
+                       help='한 번에 warping/생성할 드라이빙 프레임 수 (기본값: 1, 메모리 부족 시 자동 감소)')
+    parser.add_argument('--motion-reuse-eps', type=float, default=0.0,
+                       help='드라이빙 키포인트 변화가 이 값보다 작으면 이전 결과 프레임 재사용 (기본값: 0 = 비활성화, 예: 1e-3)')
+    parser.add_argument('--driving-track-interval', type=int, default=1,
+                       help='드라이빙 크롭 시 랜드마크 모델 실행 간격, 사이 프레임은 트래킹 (기본값: 1 = 매 프레임)')
+    parser.add_argument('--driving-track-min-confidence', type=float, default=0.8,
+                       help='트래킹 신뢰도가 이 값보다 낮으면 얼굴 재검출 (기본값: 0.8)')
+    parser.add_argument('--deadline-ms', type=int, default=None,
+                       help='변환 마감 시간(ms) - 맞추기 위해 FPS/해상도/paste-back을 단계적으로 낮추고, 넘기면 부분 영상 저장')
     
     # 크롭 설정
     parser.add_argument('--scale', type=float, default=2.3,
@@ -383,32 +1417,59 @@ def main():
                        help='GPU 디바이스 ID (기본값: 0)')
     
     args = parser.parse_args()
+    if not args.manifest and not (args.source and args.driving):
+        parser.error("-s/--source와 -d/--driving이 필요합니다 (또는 --manifest 사용)")
+    
+    # 설정 구성
+    kwargs = {
+        'flag_use_half_precision': not args.no_half_precision,
+        'flag_crop_driving_video': args.crop_driving_video,
+        'device_id': args.device_id,
+        'flag_force_cpu': args.force_cpu,
+        'flag_stitching': not args.no_stitching,
+        'flag_relative_motion': not args.no_relative_motion,
+        'flag_pasteback': not args.no_pasteback,
+        'flag_do_crop': not args.no_crop,
+        'driving_option': args.driving_option,
+        'driving_multiplier': args.driving_multiplier,
+        'audio_priority': args.audio_priority,
+        'animation_region': args.animation_region,
+        'quality': args.quality,
+        'video_codec': args.video_codec,
+        'video_crf': args.video_crf,
+        'video_bitrate': args.video_bitrate,
+        'video_preset': args.video_preset,
+        'output_scale': args.output_scale,
+        'pixel_format': args.pixel_format,
+        'scale': args.scale,
+        'source_max_dim': args.source_max_dim,
+        
+        # concat 설정 (속도 최적화)
+        'flag_save_concat_video': args.save_concat and not args.no_concat,
+        'frame_batch_size': args.frame_batch_size,
+        'driving_track_interval': args.driving_track_interval,
+        'driving_track_min_confidence': args.driving_track_min_confidence,
+        'motion_reuse_eps': args.motion_reuse_eps,
+        'deadline_ms': args.deadline_ms,
+    }
     
+    temp_paths = []
     try:
+        if args.manifest:
+            print("🚀 LivePortrait CLI 시작 (manifest 배치 모드)")
+            if run_manifest(args, kwargs):
+                sys.exit(1)
+            return
+        
         print("🚀 LivePortrait CLI 시작")
         print(f"  소스: {args.source[:50]}...")
         print(f"  드라이빙: {args.driving[:50]}...")
         print(f"  출력: {args.output}")
         print(f"  설정: {args.driving_option}, 승수: {args.driving_multiplier}")
         
-        # 입력 파일 처리
+        # 입력 파일 처리 (URL/Base64는 임시 파일로 저장)
         print("\n📁 입력 파일 처리 중...")
-        
-        # 소스 이미지 처리
-        if args.source.startswith(('http', 'data:')):
-            source_path = load_image_from_input(args.source)
-        else:
-            if not osp.exists(args.source):
-                raise FileNotFoundError(f"소스 이미지를 찾을 수 없습니다: {args.source}")
-            source_path = args.source
-        
-        # 드라이빙 영상 처리
-        if args.driving.startswith(('http', 'data:')):
-            driving_path = load_video_from_input(args.driving)
-        else:
-            if not osp.exists(args.driving):
-                raise FileNotFoundError(f"드라이빙 영상을 찾을 수 없습니다: {args.driving}")
-            driving_path = args.driving
+        source_path, driving_path, temp_paths = _prepare_inputs(args.source, args.driving)
         
         print(f"✅ 소스 이미지: {source_path}")
         print(f"✅ 드라이빙 영상: {driving_path}")
@@ -417,27 +1478,6 @@ def main():
         print("\n🎭 LivePortraitConverter 초기화 중...")
         converter = LivePortraitConverter()
         
-        # 설정 구성
-        kwargs = {
-            'flag_use_half_precision': not args.no_half_precision,
-            'flag_crop_driving_video': args.crop_driving_video,
-            'device_id': args.device_id,
-            'flag_force_cpu': args.force_cpu,
-            'flag_stitching': not args.no_stitching,
-            'flag_relative_motion': not args.no_relative_motion,
-            'flag_pasteback': not args.no_pasteback,
-            'flag_do_crop': not args.no_crop,
-            'driving_option': args.driving_option,
-            'driving_multiplier': args.driving_multiplier,
-            'audio_priority': args.audio_priority,
-            'animation_region': args.animation_region,
-            'scale': args.scale,
-            'source_max_dim': args.source_max_dim,
-            
-            # concat 설정 (속도 최적화)
-            'flag_save_concat_video': args.save_concat and not args.no_concat,
-        }
-        
         # 영상 변환 실행
         print("\n⚡ LivePortrait 변환 시작...")
         output_path = converter.convert_image_video_to_video(
@@ -454,20 +1494,18 @@ def main():
             file_size = os.path.getsize(output_path)
             print(f"📁 파일 크기: {file_size:,} bytes ({file_size/1024/1024:.2f} MB)")
         
-        # 임시 파일 정리
-        if args.source.startswith(('http', 'data:')) and osp.exists(source_path):
-            os.remove(source_path)
-            print("🧹 임시 소스 이미지 파일 정리됨")
-        
-        if args.driving.startswith(('http', 'data:')) and osp.exists(driving_path):
-            os.remove(driving_path)
-            print("🧹 임시 드라이빙 영상 파일 정리됨")
-        
     except Exception as e:
         print(f"\n❌ 오류 발생: {str(e)}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    
+    finally:
+        # 임시 파일 정리 (드라이빙 영상 옆에 생긴 모션 템플릿 포함)
+        for path in temp_paths:
+            if osp.exists(path):
+                os.remove(path)
+                print(f"🧹 임시 입력 파일 정리됨: {path}")
 
 
 if __name__ == "__main__":
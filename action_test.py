@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import base64
+import os
+import shutil
+import tempfile
+import types
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+# action은 LivePortrait-main(src)과 torch가 있어야 import 가능
+action = pytest.importorskip("action")
+
+import cv2
+import torch
+
+import src.live_portrait_pipeline as lp_pipeline_module
+from src.config.argument_config import ArgumentConfig
+from src.utils.crop import paste_back, prepare_paste_back
+
+
+class _StubPipeline:
+    """모델을 로드하지 않는 FastLivePortraitPipeline 대역 (생성 횟수와 configure 인자만 기록)"""
+    created = 0
+
+    def __init__(self, inference_cfg, crop_cfg, **options):
+        type(self).created += 1
+        self.live_portrait_wrapper = type('Wrapper', (), {'inference_cfg': inference_cfg})()
+        self.cropper = type('Cropper', (), {'crop_cfg': crop_cfg})()
+        self.options = options
+
+    def configure(self, **options):
+        self.options = options
+
+
+def _converter(reuse_pipeline):
+    converter = action.LivePortraitConverter.__new__(action.LivePortraitConverter)
+    converter.last_stats = {}
+    converter.reuse_pipeline = reuse_pipeline
+    converter._pipeline = None
+    converter._cached_key = None
+    return converter
+
+
+def _pipeline_args(**overrides):
+    values = {'device_id': 0, 'flag_force_cpu': False, 'flag_use_half_precision': True, 'det_thresh': 0.15}
+    return ArgumentConfig(**{**values, **overrides})
+
+
+def test_get_pipeline_reuses_warm_pipeline():
+    """reuse_pipeline이면 두 번째 호출은 모델을 다시 만들지 않고 설정만 교체"""
+    original = action.FastLivePortraitPipeline
+    action.FastLivePortraitPipeline = _StubPipeline
+    _StubPipeline.created = 0
+    try:
+        converter = _converter(reuse_pipeline=True)
+        first = converter._get_pipeline(_pipeline_args(), 'inference_1', 'crop_1', frame_batch_size=1)
+        second = converter._get_pipeline(_pipeline_args(), 'inference_2', 'crop_2', frame_batch_size=4)
+        assert second is first
+        assert _StubPipeline.created == 1
+        assert second.live_portrait_wrapper.inference_cfg == 'inference_2'
+        assert second.cropper.crop_cfg == 'crop_2'
+        assert second.options == {'frame_batch_size': 4}
+
+        # 모델 로딩에 영향을 주는 설정이 바뀌면 새로 생성
+        third = converter._get_pipeline(_pipeline_args(device_id=1), 'inference_3', 'crop_3')
+        assert third is not first
+        assert _StubPipeline.created == 2
+
+        # reuse_pipeline=False(기본)면 매번 새로 생성
+        converter = _converter(reuse_pipeline=False)
+        assert converter._get_pipeline(_pipeline_args(), 'i', 'c') is not converter._get_pipeline(_pipeline_args(), 'i', 'c')
+    finally:
+        action.FastLivePortraitPipeline = original
+
+
+class _FakeWrapper:
+    """결정적인 warp_decode/parse_output을 가진 live_portrait_wrapper 대역
+
+    배치의 각 항목 결과가 그 항목의 입력에만 의존함 (실제 warping module + generator처럼).
+    oom_above를 지정하면 그보다 큰 배치에서 CUDA OOM과 같은 RuntimeError를 냄.
+    """
+
+    def __init__(self, oom_above=None):
+        self.oom_above = oom_above
+        self.batch_sizes = []
+
+    def warp_decode(self, feature_3d, kp_source, kp_driving):
+        k = kp_driving.shape[0]
+        self.batch_sizes.append(k)
+        if self.oom_above is not None and k > self.oom_above:
+            raise RuntimeError("CUDA out of memory. Tried to allocate 2.00 GiB")
+        value = torch.sigmoid((kp_driving - kp_source).sum(dim=(1, 2)) + feature_3d.mean(dim=(1, 2, 3, 4)))
+        out = value.view(k, 1, 1, 1) * torch.linspace(0, 1, 3 * 8 * 8).view(1, 3, 8, 8)
+        return {'out': out}
+
+    def parse_output(self, out):
+        out = np.transpose(out.data.cpu().numpy(), [0, 2, 3, 1])  # Kx3xHxW -> KxHxWx3
+        return np.clip(out * 255, 0, 255).astype(np.uint8)
+
+
+def _motion_inputs(n_frames, seed=0):
+    """정지 이미지 소스처럼 feature_3d/kp_source는 같은 객체, kp_driving만 프레임마다 다름"""
+    generator = torch.Generator().manual_seed(seed)
+    feature_3d = torch.randn(1, 4, 2, 4, 4, generator=generator)
+    kp_source = torch.randn(1, 21, 3, generator=generator)
+    kp_driving = [torch.randn(1, 21, 3, generator=generator) for _ in range(n_frames)]
+    return feature_3d, kp_source, kp_driving
+
+
+def _render(wrapper, feature_3d, kp_source, kp_driving_lst, batch_size, reuse_eps=0.0):
+    """원본 execute 루프처럼 프레임마다 warp_decode -> parse_output을 호출한 뒤 결과 프레임으로 변환"""
+    stats = {}
+    decoder = action._BatchedWarpDecoder(wrapper, batch_size, reuse_eps=reuse_eps, stats=stats)
+    pending = [decoder.parse(decoder.submit(feature_3d, kp_source, kp_driving)['out'])[0]
+               for kp_driving in kp_driving_lst]
+    return [action._resolve_frame(frame) for frame in pending], stats, decoder
+
+
+def test_batched_warp_decode_matches_batch_size_1():
+    """frame_batch_size K의 결과가 K=1(원본 호출)과 같은 순서로 동일"""
+    feature_3d, kp_source, kp_driving_lst = _motion_inputs(19)
+    wrapper = _FakeWrapper()
+    expected = [wrapper.parse_output(wrapper.warp_decode(feature_3d, kp_source, kp)['out'])[0]
+                for kp in kp_driving_lst]
+
+    for batch_size in (1, 4, 8, 32):
+        wrapper = _FakeWrapper()
+        frames, stats, _ = _render(wrapper, feature_3d, kp_source, kp_driving_lst, batch_size)
+        assert len(frames) == len(expected)
+        assert all(np.array_equal(a, b) for a, b in zip(frames, expected))
+        assert stats == {'frames_total': 19, 'frames_rendered': 19, 'frames_skipped': 0}
+        assert max(wrapper.batch_sizes) == min(batch_size, 19)
+
+
+def test_batched_warp_decode_halves_batch_on_oom():
+    """메모리 부족 시 배치 크기를 절반으로 줄여 재시도하고, 대기 중인 프레임을 빠뜨리거나 중복하지 않음"""
+    feature_3d, kp_source, kp_driving_lst = _motion_inputs(21)
+    reference = _FakeWrapper()
+    expected = [reference.parse_output(reference.warp_decode(feature_3d, kp_source, kp)['out'])[0]
+                for kp in kp_driving_lst]
+
+    wrapper = _FakeWrapper(oom_above=2)
+    frames, _, decoder = _render(wrapper, feature_3d, kp_source, kp_driving_lst, batch_size=8)
+    assert decoder.batch_size == 2
+    assert all(np.array_equal(a, b) for a, b in zip(frames, expected)) and len(frames) == 21
+    # 성공한 배치의 크기 합 = 프레임 수 (중복 실행 없음)
+    assert sum(k for k in wrapper.batch_sizes if k <= 2) == 21
+
+    # 배치 크기 1에서도 실패하면 그대로 예외
+    wrapper = _FakeWrapper(oom_above=0)
+    with pytest.raises(RuntimeError):
+        _render(wrapper, feature_3d, kp_source, kp_driving_lst, batch_size=4)
+
+
+def test_motion_reuse_skips_near_identical_keypoints():
+    """드라이빙 키포인트가 마지막 렌더링 프레임과 reuse_eps 안이면 네트워크를 건너뛰고 그 프레임을 재사용"""
+    feature_3d, kp_source, kp_driving_lst = _motion_inputs(6)
+    # 0 렌더링, 1-2 재사용 (마지막 렌더링 프레임 0 기준 오차 누적), 3 렌더링, 4 재사용, 5 렌더링
+    kp_driving_lst[1] = kp_driving_lst[0] + 1e-5
+    kp_driving_lst[2] = kp_driving_lst[1] + 1e-5
+    kp_driving_lst[4] = kp_driving_lst[3] - 1e-5
+    reused = {1: 0, 2: 0, 4: 3}
+
+    wrapper = _FakeWrapper()
+    frames, stats, _ = _render(wrapper, feature_3d, kp_source, kp_driving_lst, batch_size=4, reuse_eps=1e-3)
+    assert stats == {'frames_total': 6, 'frames_rendered': 3, 'frames_skipped': 3}
+    assert sum(wrapper.batch_sizes) == 3
+    for i, frame in enumerate(frames):
+        if i in reused:
+            assert frame is frames[reused[i]]
+        else:
+            expected = wrapper.parse_output(wrapper.warp_decode(feature_3d, kp_source, kp_driving_lst[i])['out'])[0]
+            assert np.array_equal(frame, expected)
+
+    # reuse_eps=0(기본)이면 재사용하지 않음
+    frames, stats, _ = _render(_FakeWrapper(), feature_3d, kp_source, kp_driving_lst, batch_size=4)
+    assert stats['frames_skipped'] == 0 and len({id(frame) for frame in frames}) == 6
+
+    # 소스 영상처럼 프레임마다 소스 특징이 새 텐서면 값이 같아도 재사용하지 않음
+    stats = {}
+    decoder = action._BatchedWarpDecoder(_FakeWrapper(), 4, reuse_eps=1e-3, stats=stats)
+    for kp_driving in kp_driving_lst:
+        decoder.submit(feature_3d.clone(), kp_source.clone(), kp_driving)
+    decoder.flush()
+    assert stats['frames_skipped'] == 0
+
+
+def _paste_back_inputs(n_frames, seed=0):
+    """정지 이미지 소스의 paste-back 입력: 원본/변환/마스크는 공통, 크롭 프레임만 다름 (연속 재사용 포함)"""
+    rng = np.random.default_rng(seed)
+    img_ori = rng.integers(0, 256, (72, 96, 3), dtype=np.uint8)
+    # 크롭(32x32) -> 원본 좌표: 회전 + 확대 + 이동, 마스크 일부는 원본 밖으로 나감
+    angle, scale = np.deg2rad(17), 1.6
+    M_c2o = np.array([[scale * np.cos(angle), -scale * np.sin(angle), 50.5],
+                      [scale * np.sin(angle), scale * np.cos(angle), 8.25],
+                      [0, 0, 1]], dtype=np.float32)
+    yy, xx = np.mgrid[:32, :32]
+    blob = np.exp(-((yy - 16) ** 2 + (xx - 16) ** 2) / 80.0)
+    mask_crop = np.repeat((blob * 255).astype(np.uint8)[..., None], 3, axis=2)
+    mask_ori = prepare_paste_back(mask_crop, M_c2o, dsize=(img_ori.shape[1], img_ori.shape[0]))
+    crops = []
+    for i in range(n_frames):
+        if i % 4 == 3:
+            crops.append(crops[-1])  # 모션 재사용으로 같은 크롭 객체가 이어짐
+        else:
+            crops.append(rng.integers(0, 256, (32, 32, 3), dtype=np.uint8))
+    return crops, M_c2o, img_ori, mask_ori
+
+
+class _DecoderStandIn:
+    """_PendingFrame의 값을 돌려주는 _BatchedWarpDecoder 대역 (result만 구현)"""
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def result(self, index):
+        return self.frames[index]
+
+
+def test_paste_back_stage_matches_reference():
+    """정지 이미지 소스의 배치 블렌딩 결과가 원본 paste_back과 프레임 순서대로 동일"""
+    crops, M_c2o, img_ori, mask_ori = _paste_back_inputs(13)
+    expected = [paste_back(crop, M_c2o, img_ori, mask_ori) for crop in crops]
+
+    for batch_size in (1, 3, 8, 32):
+        stage = action._PasteBackStage(paste_back, batch_size, static_source=True)
+        pending = [stage.submit(crop, M_c2o, img_ori, mask_ori) for crop in crops]
+        frames = [action._resolve_frame(frame) for frame in pending]
+        assert len(frames) == len(expected)
+        assert all(np.array_equal(a, b) for a, b in zip(frames, expected))
+        # 재사용된 크롭은 블렌딩하지 않고 앞 프레임 결과를 공유
+        assert len(stage.items) == 10
+
+    # 배치 디코더가 만든 지연 프레임도 같은 결과
+    stage = action._PasteBackStage(paste_back, 4, static_source=True)
+    decoded = _DecoderStandIn(crops)
+    wrapped = [action._PendingFrame(decoded, i) for i in range(len(crops))]
+    frames = [action._resolve_frame(stage.submit(frame, M_c2o, img_ori, mask_ori)) for frame in wrapped]
+    assert all(np.array_equal(a, b) for a, b in zip(frames, expected))
+
+    # 영상 소스는 즉시 원본 paste_back 호출
+    stage = action._PasteBackStage(paste_back, 4, static_source=False)
+    assert np.array_equal(stage.submit(crops[0], M_c2o, img_ori, mask_ori), expected[0])
+    assert not stage.items
+
+
+class _CropperStandIn:
+    """얼굴 검출/랜드마크 모델 대신 프레임 값으로 결과를 정하는 Cropper 대역
+    
+    프레임 [0, 0, 0] 픽셀이 255면 얼굴 없음, 랜드마크는 프레임 번호([0, 0, 1] 픽셀)로 정해짐.
+    """
+
+    def __init__(self):
+        self.crop_cfg = types.SimpleNamespace(scale_crop_driving_video=2.2, vx_ratio_crop_driving_video=0.0,
+                                              vy_ratio_crop_driving_video=-0.1)
+        self.face_analysis_wrapper = types.SimpleNamespace(get=self._detect)
+        self.human_landmark_runner = types.SimpleNamespace(run=self._landmark)
+
+    @staticmethod
+    def _detect(frame_bgr, **kwargs):
+        if frame_bgr[0, 0, 2] == 255:  # BGR로 전달됨
+            return []
+        return [types.SimpleNamespace(landmark_2d_106=np.zeros((106, 2), np.float32))]
+
+    @staticmethod
+    def _landmark(frame_rgb, lmk):
+        return np.full((203, 2), 10.0 + frame_rgb[0, 0, 1], np.float32)
+
+
+def _track_driving(frames):
+    """src.utils.crop 함수를 단순한 대역으로 바꾸고 crop_driving_video_tracked 실행"""
+    originals = (action.parse_bbox_from_landmark, action.crop_image_by_bbox, action.average_bbox_lst)
+    action.parse_bbox_from_landmark = lambda lmk, **kw: {'bbox': np.array([[0, 0], [0, 8], [8, 8], [8, 0]])}
+    action.crop_image_by_bbox = lambda img, bbox, lmk=None, **kw: {'img_crop': img, 'lmk_crop': lmk}
+    action.average_bbox_lst = lambda bbox_lst: bbox_lst[0]
+    stats = {}
+    try:
+        # 신뢰도가 1을 넘을 수 없으므로 트래킹 대신 매 프레임 검출
+        result = action.crop_driving_video_tracked(_CropperStandIn(), frames, min_confidence=1.01, stats=stats)
+    finally:
+        action.parse_bbox_from_landmark, action.crop_image_by_bbox, action.average_bbox_lst = originals
+    return result, stats
+
+
+def _driving_frames(n_frames, lost):
+    frames = []
+    for idx in range(n_frames):
+        frame = np.zeros((8, 8, 3), np.uint8)
+        frame[0, 0, 1] = idx
+        frame[0, 0, 0] = 255 if idx in lost else 0
+        frames.append(frame)
+    return frames
+
+
+def test_tracked_driving_crop_keeps_frames_when_face_is_lost():
+    """중간에 얼굴을 놓쳐도 입력 프레임마다 크롭을 하나씩 만들고 마지막 랜드마크를 재사용"""
+    frames = _driving_frames(6, lost={2, 3})
+    result, stats = _track_driving(frames)
+    assert len(result['frame_crop_lst']) == len(result['lmk_crop_lst']) == 6
+    assert all(crop is frame for crop, frame in zip(result['frame_crop_lst'], frames))
+    assert [lmk[0, 0] for lmk in result['lmk_crop_lst']] == [10, 11, 11, 11, 14, 15]
+    assert stats['lost'] == 2
+
+    # 첫 프레임부터 얼굴이 없으면 원본처럼 실패
+    with pytest.raises(Exception, match="No face detected in the frame #0"):
+        _track_driving(_driving_frames(3, lost={0}))
+
+
+def _patched_module_functions(pipeline, args, **replacements):
+    """lp_pipeline_module 함수를 replacements로 바꾼 상태에서 _build_patches 결과를 {이름: 대체 함수}로 반환"""
+    originals = {name: getattr(lp_pipeline_module, name) for name in replacements}
+    try:
+        for name, func in replacements.items():
+            setattr(lp_pipeline_module, name, func)
+        return {name: replacement for owner, name, replacement in pipeline._build_patches(args)
+                if owner is lp_pipeline_module}
+    finally:
+        for name, func in originals.items():
+            setattr(lp_pipeline_module, name, func)
+
+
+def test_driving_max_fps_keeps_exact_frame_rate():
+    """프레임을 건너뛴 뒤 FPS가 정수가 아니어도 인코더에는 정확한 유리수 FPS를 전달"""
+    original_writer = action.images2video_ffmpeg
+    written = {}
+    action.images2video_ffmpeg = lambda images, wfp, **kw: written.update(kw, n=len(images))
+    try:
+        for source_fps, expected in ((25.0, Fraction(25, 3)), (30000 / 1001, Fraction(10000, 1001))):
+            pipeline = action.FastLivePortraitPipeline.__new__(action.FastLivePortraitPipeline)
+            pipeline.configure(disable_concat=False, driving_max_fps=12)
+            pipeline.live_portrait_wrapper = None  # 배치/재사용 옵션이 없으면 사용하지 않음
+            args = ArgumentConfig(source='s.jpg', driving='d.mp4', output_dir='out')
+            frames = [np.zeros((4, 4, 3), np.uint8)] * 30
+            patched = _patched_module_functions(pipeline, args, get_fps=lambda path, *a, **kw: source_fps,
+                                                load_video=lambda path, *a, **kw: frames)
+
+            assert len(patched['load_video']('d.mp4')) == 10
+            assert patched['get_fps']('d.mp4') == float(expected)
+            patched['images2video'](frames[:10], wfp='out/result.mp4', fps=int(patched['get_fps']('d.mp4')))
+            assert written['fps'] == expected
+            # 영상 길이 유지: 10프레임 / (25/3)fps = 30프레임 / 25fps
+            assert written['n'] / written['fps'] == pytest.approx(30 / source_fps)
+    finally:
+        action.images2video_ffmpeg = original_writer
+
+
+def test_images2video_ffmpeg_reports_encoder_error():
+    """ffmpeg가 옵션을 거부하고 바로 종료해도 BrokenPipeError 대신 ffmpeg 메시지로 실패"""
+    bin_dir = tempfile.mkdtemp()
+    original_path = os.environ.get('PATH', '')
+    try:
+        ffmpeg = os.path.join(bin_dir, 'ffmpeg')
+        with open(ffmpeg, 'w') as f:
+            f.write("#!/bin/sh\necho \"Unknown encoder 'libx999'\" >&2\nexit 1\n")
+        os.chmod(ffmpeg, 0o755)
+        os.environ['PATH'] = bin_dir + os.pathsep + original_path
+        
+        frames = [np.zeros((256, 256, 3), np.uint8)] * 20  # 파이프 버퍼보다 큰 입력
+        with pytest.raises(RuntimeError, match="Unknown encoder 'libx999'"):
+            action.images2video_ffmpeg(frames, os.path.join(bin_dir, 'out.mp4'), video_codec='libx999')
+    finally:
+        os.environ['PATH'] = original_path
+        shutil.rmtree(bin_dir)
+
+
+def test_prepare_inputs_cleans_up_motion_template():
+    """임시 드라이빙 영상과 함께 원본 파이프라인이 옆에 저장하는 모션 템플릿(.pkl)도 정리 대상"""
+    source_dir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(source_dir, 'source.jpg')
+        open(source, 'wb').close()
+        driving = 'data:video/mp4;base64,' + base64.b64encode(b'not really a video').decode()
+        source_path, driving_path, temp_paths = action._prepare_inputs(source, driving)
+        assert source_path == source
+        assert temp_paths == [driving_path, os.path.splitext(driving_path)[0] + '.pkl']
+        for path in temp_paths:
+            if os.path.exists(path):
+                os.remove(path)
+    finally:
+        shutil.rmtree(source_dir)
+
+
+def test_prepare_inputs_removes_source_when_driving_fails():
+    """드라이빙 입력 준비가 실패하면 이미 받은 소스 임시 파일을 지우고 예외를 그대로 전달"""
+    ok, png = cv2.imencode('.png', np.zeros((8, 8, 3), np.uint8))
+    source = 'data:image/png;base64,' + base64.b64encode(png.tobytes()).decode()
+    loaded = []
+    original = action.load_image_from_input
+    action.load_image_from_input = lambda image_input: loaded.append(original(image_input)) or loaded[-1]
+    try:
+        with pytest.raises(FileNotFoundError):
+            action._prepare_inputs(source, '/nonexistent/driving.mp4')
+    finally:
+        action.load_image_from_input = original
+    assert len(loaded) == 1 and not os.path.exists(loaded[0])
+
+
+def test_completed_manifest_ids_skips_truncated_line():
+    """기록 중 중단되어 마지막 줄이 잘린 리포트로도 재실행 가능 (잘린 행은 미완료)"""
+    report_dir = tempfile.mkdtemp()
+    try:
+        report_path = os.path.join(report_dir, 'manifest_report.jsonl')
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write('{"id": "a", "status": "success"}\n')
+            f.write('{"id": "b", "status": "error"}\n')
+            f.write('{"id": "b", "status": "success"}\n')
+            f.write('{"id": "c", "status": "succ')
+        assert action._completed_manifest_ids(report_path) == {'a', 'b'}
+    finally:
+        shutil.rmtree(report_dir)
+
+
+def test_deadline_controller_applies_only_effective_degradations():
+    """소스 영상은 프레임 재사용 단계를, paste-back이 없으면 paste-back 생략 단계를 건너뜀"""
+    controller = action._DeadlineController(10_000)
+    for _ in range(4):
+        controller._degrade(2.0)
+    assert controller.degradations == ['driving_fps_1/2', 'driving_fps_1/3', 'preview_resolution']
+    assert controller.frame_step == 3
+
+    controller = action._DeadlineController(10_000)
+    controller.static_source = False
+    controller.pasted.append(object())  # paste-back이 실행 중
+    reserve = controller.reserve
+    for _ in range(3):
+        controller._degrade(2.0)
+    assert controller.degradations == ['no_pasteback', 'preview_resolution']
+    assert controller.frame_step == 1 and not controller.pasteback
+    # 출력 픽셀 수가 1/4이 되므로 인코딩 여유 시간도 1/4
+    assert controller.reserve == pytest.approx(reserve * 0.25)
+
+
+if __name__ == "__main__":
+    test_get_pipeline_reuses_warm_pipeline()
+    test_batched_warp_decode_matches_batch_size_1()
+    test_batched_warp_decode_halves_batch_on_oom()
+    test_motion_reuse_skips_near_identical_keypoints()
+    test_paste_back_stage_matches_reference()
+    test_tracked_driving_crop_keeps_frames_when_face_is_lost()
+    test_driving_max_fps_keeps_exact_frame_rate()
+    test_images2video_ffmpeg_reports_encoder_error()
+    test_prepare_inputs_cleans_up_motion_template()
+    test_prepare_inputs_removes_source_when_driving_fails()
+    test_completed_manifest_ids_skips_truncated_line()
+    test_deadline_controller_applies_only_effective_degradations()
+    print("✅ action 테스트 통과")
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LivePortrait 최적화 벤치마크
+
+사용 예시:
+  # paste-back: 원본 per-frame paste_back vs 캐시/배치 paste-back
+  python benchmark.py pasteback --max-dims 1280 1920 2560
+
+  # 드라이빙 크롭: 매 프레임 랜드마크 vs 키프레임 + 트래킹
+  python benchmark.py tracking -d driving.mp4 --intervals 5 10 20
+
+  # 품질 프리셋: final vs preview 전체 변환 시간
+  python benchmark.py quality -s source.jpg -d driving.mp4
+
+  # 임시 저장소: 디스크 vs RAM(/dev/shm) 작업 I/O 시간
+  python benchmark.py scratch -d driving.mp4 --rounds 20
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from action import (PASTEBACK_BATCH_SIZE, LivePortraitConverter, _PasteBackStage, _resolve_frame,
+                    crop_driving_video_tracked)
+from job_utils import ScratchStorage, file_sha256
+from src.config.crop_config import CropConfig
+from src.config.inference_config import InferenceConfig
+from src.cropper import Cropper
+from src.utils.crop import prepare_paste_back, paste_back
+from src.utils.io import load_video
+
+
+def _synthetic_crop_to_original(max_dim):
+    """source_max_dim 크기의 원본 이미지와 얼굴 크롭(512) -> 원본 affine 변환 생성"""
+    height, width = max_dim, max_dim * 3 // 4
+    scale = 0.45 * width / 512  # 얼굴이 원본 너비의 약 45%를 차지
+    angle = np.deg2rad(8.0)
+    M_c2o = np.array([
+        [scale * np.cos(angle), -scale * np.sin(angle), width * 0.25],
+        [scale * np.sin(angle), scale * np.cos(angle), height * 0.2],
+        [0, 0, 1],
+    ], dtype=np.float32)
+    return (height, width), M_c2o
+
+
+def bench_pasteback(args):
+    """정지 이미지 소스의 paste-back 시간 비교 (결과 동일성 확인 포함)"""
+    rng = np.random.default_rng(0)
+    mask_crop = InferenceConfig().mask_crop
+
+    print(f"🧪 paste-back 벤치마크 (프레임 수: {args.frames}, 배치: {args.batch_size})")
+    for max_dim in args.max_dims:
+        (height, width), M_c2o = _synthetic_crop_to_original(max_dim)
+        img_ori = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        crops = [rng.integers(0, 256, (512, 512, 3), dtype=np.uint8) for _ in range(args.frames)]
+        mask_ori = prepare_paste_back(mask_crop, M_c2o, dsize=(width, height))
+
+        start = time.perf_counter()
+        expected = [paste_back(crop, M_c2o, img_ori, mask_ori) for crop in crops]
+        baseline = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stage = _PasteBackStage(paste_back, args.batch_size, static_source=True)
+        pending = [stage.submit(crop, M_c2o, img_ori, mask_ori) for crop in crops]
+        actual = [_resolve_frame(frame) for frame in pending]
+        optimized = time.perf_counter() - start
+
+        identical = all(np.array_equal(a, b) for a, b in zip(expected, actual))
+        print(f"  - {width}x{height}: {baseline / args.frames * 1000:.1f}ms -> "
+              f"{optimized / args.frames * 1000:.1f}ms/frame "
+              f"(x{baseline / optimized:.2f}, 동일: {'✅' if identical else '❌'})")
+
+
+def bench_tracking(args):
+    """드라이빙 크롭 시간과 매 프레임 랜드마크 대비 크롭 랜드마크 오차(drift) 비교"""
+    driving_rgb_lst = load_video(args.driving)
+    cropper = Cropper(crop_cfg=CropConfig(device_id=args.device_id, flag_force_cpu=args.force_cpu))
+    cropper.crop_driving_video(driving_rgb_lst[:1])  # 워밍업
+
+    print(f"🧪 드라이빙 크롭 트래킹 벤치마크 ({len(driving_rgb_lst)} 프레임)")
+    start = time.perf_counter()
+    expected = cropper.crop_driving_video(driving_rgb_lst)
+    baseline = time.perf_counter() - start
+    print(f"  - 매 프레임 랜드마크: {baseline:.2f}초")
+
+    for interval in args.intervals:
+        stats = {}
+        start = time.perf_counter()
+        actual = crop_driving_video_tracked(cropper, driving_rgb_lst, detect_interval=interval,
+                                            min_confidence=args.min_confidence, stats=stats)
+        elapsed = time.perf_counter() - start
+
+        if len(actual['lmk_crop_lst']) != len(expected['lmk_crop_lst']):
+            print(f"  - interval {interval}: {elapsed:.2f}초 (x{baseline / elapsed:.2f}), "
+                  f"프레임 수 불일치 {len(actual['lmk_crop_lst'])} != {len(expected['lmk_crop_lst'])}")
+            continue
+        # 512x512 크롭 좌표계에서 랜드마크 위치 차이 (픽셀)
+        drift = np.array([np.linalg.norm(a - b, axis=1).mean()
+                          for a, b in zip(actual['lmk_crop_lst'], expected['lmk_crop_lst'])])
+        print(f"  - interval {interval}: {elapsed:.2f}초 (x{baseline / elapsed:.2f}), "
+              f"drift 평균 {drift.mean():.2f}px / 최대 {drift.max():.2f}px, "
+              f"검출 {stats['detect']}회 · 랜드마크 {stats['landmark']}회 · 트래킹 {stats['track']}회")
+
+
+def bench_quality(args):
+    """같은 클립을 final / preview 프리셋으로 변환해 전체 지연 시간 비교"""
+    converter = LivePortraitConverter()
+    results = {}
+    print(f"🧪 품질 프리셋 벤치마크 ({args.source}, {args.driving})")
+    for quality in ('final', 'preview'):
+        output_dir = tempfile.mkdtemp(prefix=f"bench_{quality}_")
+        start = time.perf_counter()
+        output_path = converter.convert_image_video_to_video(
+            source_image_path=args.source,
+            driving_video_path=args.driving,
+            output_dir=output_dir,
+            quality=quality,
+            flag_force_cpu=args.force_cpu,
+        )
+        results[quality] = time.perf_counter() - start
+        print(f"  - {quality}: {results[quality]:.2f}초, {os.path.getsize(output_path):,} bytes")
+        shutil.rmtree(output_dir)
+    print(f"  - preview 속도 향상: x{results['final'] / results['preview']:.2f}")
+
+
+def bench_scratch(args):
+    """작업 한 건의 파일 I/O(입력 저장 -> 읽기 -> 결과 쓰기 -> 체크섬/전달용 읽기)를 저장소별로 비교"""
+    if args.driving:
+        with open(args.driving, 'rb') as f:
+            data = f.read()
+    else:
+        data = os.urandom(args.size_mb * 1024 * 1024)
+    
+    backends = {'disk': ScratchStorage(shm_dir=None)}
+    shm = ScratchStorage(shm_max_bytes=float('inf'), ram_headroom_bytes=0)
+    if shm.shm_dir is None or shm.backend_for(3 * len(data)) != 'shm':
+        print("⚠️  /dev/shm을 사용할 수 없거나 공간이 부족해 디스크만 측정합니다")
+    else:
+        backends['shm'] = shm
+    
+    print(f"🧪 임시 저장소 벤치마크 ({len(data):,} bytes, {args.rounds}회{', fsync 포함' if args.fsync else ''})")
+    results = {}
+    for name, storage in backends.items():
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            output_dir = storage.mkdtemp(size_hint=2 * len(data))
+            driving_path = storage.write_bytes(data, suffix='.mp4', prefix='driving_video_')  # 입력 다운로드 저장
+            with open(driving_path, 'rb') as f:  # 디코딩
+                frames = f.read()
+            output_path = os.path.join(output_dir, 'result.mp4')  # 결과 인코딩
+            with open(output_path, 'wb') as f:
+                f.write(frames)
+                if args.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            file_sha256(output_path)  # 결과 전달 (체크섬/업로드 읽기)
+            os.remove(driving_path)
+            shutil.rmtree(output_dir)
+        results[name] = (time.perf_counter() - start) / args.rounds
+        print(f"  - {name}: {results[name] * 1000:.1f}ms/작업")
+    if 'shm' in results:
+        print(f"  - shm 속도 향상: x{results['disk'] / results['shm']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LivePortrait 최적화 벤치마크")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pasteback_parser = subparsers.add_parser('pasteback', help='paste-back 캐시/배치 블렌딩 벤치마크')
+    pasteback_parser.add_argument('--max-dims', type=int, nargs='+', default=[1280, 1920, 2560],
+                                  help='원본 이미지 최대 해상도 목록 (기본값: 1280 1920 2560)')
+    pasteback_parser.add_argument('--frames', type=int, default=64,
+                                  help='측정할 프레임 수 (기본값: 64)')
+    pasteback_parser.add_argument('--batch-size', type=int, default=PASTEBACK_BATCH_SIZE,
+                                  help=f'블렌딩 배치 크기 (기본값: {PASTEBACK_BATCH_SIZE})')
+    pasteback_parser.set_defaults(func=bench_pasteback)
+
+    tracking_parser = subparsers.add_parser('tracking', help='드라이빙 얼굴 트래킹 크롭 벤치마크')
+    tracking_parser.add_argument('-d', '--driving', required=True, help='드라이빙 영상 파일 경로')
+    tracking_parser.add_argument('--intervals', type=int, nargs='+', default=[5, 10, 20],
+                                 help='랜드마크 모델 실행 간격 목록 (기본값: 5 10 20)')
+    tracking_parser.add_argument('--min-confidence', type=float, default=0.8,
+                                 help='재검출 기준 트래킹 신뢰도 (기본값: 0.8)')
+    tracking_parser.add_argument('--device-id', type=int, default=0, help='GPU 디바이스 ID (기본값: 0)')
+    tracking_parser.add_argument('--force-cpu', action='store_true', help='CPU 강제 사용')
+    tracking_parser.set_defaults(func=bench_tracking)
+
+    quality_parser = subparsers.add_parser('quality', help='final / preview 품질 프리셋 지연 시간 비교')
+    quality_parser.add_argument('-s', '--source', required=True, help='소스 이미지 파일 경로')
+    quality_parser.add_argument('-d', '--driving', required=True, help='드라이빙 영상 파일 경로')
+    quality_parser.add_argument('--force-cpu', action='store_true', help='CPU 강제 사용')
+    quality_parser.set_defaults(func=bench_quality)
+
+    scratch_parser = subparsers.add_parser('scratch', help='디스크 / RAM(/dev/shm) 임시 저장소 I/O 비교')
+    scratch_parser.add_argument('-d', '--driving', default=None,
+                                help='입력으로 쓸 영상 파일 (없으면 --size-mb 크기의 랜덤 데이터)')
+    scratch_parser.add_argument('--size-mb', type=int, default=32, help='랜덤 입력 크기 MB (기본값: 32)')
+    scratch_parser.add_argument('--rounds', type=int, default=10, help='반복 횟수 (기본값: 10)')
+    scratch_parser.add_argument('--fsync', action='store_true', help='결과 쓰기 후 fsync (디스크 writeback 비용 포함)')
+    scratch_parser.set_defaults(func=bench_scratch)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,548 @@
+"""RunPod 작업 처리 유틸리티 - 결과 전달, 입력 비용 추정, 임시 저장소, 자원 측정 등 LivePortrait 모델과 무관한 부분"""
+
+import base64
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from fractions import Fraction
+
+import requests
+
+# boto3는 S3 호환 엔드포인트로 presigned URL을 만들 때만 필요
+try:
+    import boto3
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 업로드/체크섬 계산 단위 (1MB)
+INLINE_MAX_BYTES = 10 * 1024 * 1024  # auto 모드에서 base64로 응답에 넣을 최대 크기 (10MB)
+PROBE_RANGE_BYTES = 1024 * 1024  # URL 입력 probe 시 앞/뒤에서 받을 크기 (1MB)
+
+# 임시 저장소: 작업 중간 파일을 RAM 기반 tmpfs(/dev/shm)에 두고, 크기 한도를 넘으면 디스크 사용
+# LP_SCRATCH_SHM_DIR를 빈 문자열로 두면 항상 디스크 사용
+SCRATCH_SHM_DIR = os.environ.get('LP_SCRATCH_SHM_DIR', '/dev/shm')
+SCRATCH_SHM_MAX_BYTES = int(os.environ.get('LP_SCRATCH_SHM_MAX_BYTES', 1024 ** 3))  # 파일(디렉토리) 하나의 shm 한도
+SCRATCH_RAM_HEADROOM_BYTES = int(os.environ.get('LP_SCRATCH_RAM_HEADROOM_BYTES', 4 * 1024 ** 3))  # 모델/프레임용 RAM 여유
+SCRATCH_DEFAULT_SIZE_HINT = 256 * 1024 * 1024  # 크기를 모를 때 가정하는 크기
+
+RESOURCE_SAMPLE_INTERVAL = 0.2  # 자원 사용량 샘플링 간격 (초)
+
+# 작업 비용 모델: 예상 처리 시간(초) = base + per_frame * 프레임 수 + per_megapixel_frame * 프레임 수 * 메가픽셀
+# 응답의 cost_estimate와 timing을 모아 계수를 보정하고 환경 변수로 덮어씀
+COST_MODEL = {
+    'base_seconds': float(os.environ.get('LP_COST_BASE_SECONDS', 15.0)),
+    'per_frame_seconds': float(os.environ.get('LP_COST_PER_FRAME_SECONDS', 0.06)),
+    'per_megapixel_frame_seconds': float(os.environ.get('LP_COST_PER_MEGAPIXEL_FRAME_SECONDS', 0.004)),
+}
+
+# 작업 수락 기준 (워커 운영자가 환경 변수로 설정)
+ADMISSION_LIMITS = {
+    'max_duration_seconds': float(os.environ.get('LP_MAX_DRIVING_SECONDS', 300)),
+    'max_pixels': int(os.environ.get('LP_MAX_DRIVING_PIXELS', 1920 * 1080)),
+    'max_estimated_seconds': float(os.environ.get('LP_MAX_ESTIMATED_SECONDS', 600)),
+    'min_fps': float(os.environ.get('LP_MIN_DRIVING_FPS', 10)),
+    'policy': os.environ.get('LP_ADMISSION_POLICY', 'downscale'),  # "downscale" | "reject"
+}
+
+
+def file_sha256(path, chunk_size=UPLOAD_CHUNK_SIZE):
+    """파일 전체를 메모리에 올리지 않고 SHA-256 계산"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _ChunkedFileBody:
+    """파일을 chunk_size 단위로 보내는 요청 본문 (__len__이 있어 Content-Length가 설정됨)"""
+
+    def __init__(self, path, chunk_size):
+        self.path = path
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return os.path.getsize(self.path)
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                yield chunk
+
+
+def upload_file(path, url, content_type='video/mp4', retries=3, backoff=1.0,
+                chunk_size=UPLOAD_CHUNK_SIZE, timeout=60):
+    """presigned PUT URL로 파일을 청크 단위로 스트리밍 업로드 (일시적 오류는 재시도)
+
+    Args:
+        path: 업로드할 파일 경로
+        url: presigned PUT URL
+        retries: 연결 오류, 5xx, 429 응답일 때 재시도 횟수
+        backoff: 재시도 대기 시간 기준 (초, 시도마다 2배)
+
+    Returns:
+        dict: {'url', 'size', 'sha256'}
+    """
+    size = os.path.getsize(path)
+    sha256 = file_sha256(path, chunk_size)
+
+    for attempt in range(retries + 1):
+        try:
+            response = requests.put(url, data=_ChunkedFileBody(path, chunk_size),
+                                    headers={'Content-Type': content_type}, timeout=timeout)
+            if response.status_code < 500 and response.status_code != 429:
+                response.raise_for_status()  # 4xx는 재시도해도 같으므로 바로 실패
+                break
+            error = requests.HTTPError(f"{response.status_code} {response.reason}", response=response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+
+        if attempt == retries:
+            raise RuntimeError(f"업로드 실패 ({retries + 1}회 시도): {error}")
+        print(f"⚠️  업로드 재시도 {attempt + 1}/{retries}: {error}")
+        time.sleep(backoff * (2 ** attempt))
+
+    # presigned 서명(query string)은 응답에 남기지 않음
+    return {'url': url.split('?', 1)[0], 'size': size, 'sha256': sha256}
+
+
+def presign_s3_put(bucket, key, endpoint_url=None, access_key=None, secret_key=None,
+                   region=None, expires_in=3600):
+    """S3 호환 엔드포인트의 PUT presigned URL 생성 (boto3 필요)"""
+    if not BOTO3_AVAILABLE:
+        raise ImportError("S3 업로드에는 boto3가 필요합니다. pip install boto3")
+    client = boto3.client(
+        's3',
+        endpoint_url=endpoint_url,
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        region_name=region,
+    )
+    return client.generate_presigned_url(
+        'put_object',
+        Params={'Bucket': bucket, 'Key': key, 'ContentType': 'video/mp4'},
+        ExpiresIn=expires_in,
+    )
+
+
+def deliver_output(path, output_mode='auto', upload_url=None, s3_config=None,
+                   inline_max_bytes=INLINE_MAX_BYTES):
+    """결과 파일을 응답에 넣을 형태로 전달
+
+    Args:
+        path: 결과 영상 경로
+        output_mode: "auto" | "base64" | "upload"
+            - base64: 항상 응답에 base64로 포함
+            - upload: 항상 업로드하고 URL/크기/체크섬만 응답
+            - auto: 업로드 대상이 있고 inline_max_bytes보다 크면 업로드, 아니면 base64
+        upload_url: presigned PUT URL
+        s3_config: presign_s3_put 인자 dict (bucket, key, endpoint_url, access_key, secret_key, region)
+
+    Returns:
+        dict: 응답 output에 합칠 필드
+    """
+    if output_mode not in ('auto', 'base64', 'upload'):
+        raise ValueError(f"지원하지 않는 output_mode입니다: {output_mode} (auto, base64, upload)")
+
+    size = os.path.getsize(path)
+    has_target = bool(upload_url or s3_config)
+    if output_mode == 'upload' and not has_target:
+        raise ValueError("output_mode가 upload이면 output_upload_url 또는 output_s3가 필요합니다")
+
+    if output_mode == 'upload' or (output_mode == 'auto' and has_target and size > inline_max_bytes):
+        url = upload_url or presign_s3_put(**s3_config)
+        print(f"결과 영상 업로드 중... ({size:,} bytes)")
+        uploaded = upload_file(path, url)
+        return {
+            'output_mode': 'upload',
+            'video_url': uploaded['url'],
+            'file_size_bytes': uploaded['size'],
+            'sha256': uploaded['sha256'],
+        }
+
+    if size > inline_max_bytes:
+        print(f"⚠️  결과 영상이 {size:,} bytes로 큽니다 - output_upload_url 사용을 권장합니다")
+    print("비디오를 Base64로 인코딩 중...")
+    with open(path, 'rb') as video_file:
+        video_b64 = base64.b64encode(video_file.read()).decode('utf-8')
+    return {
+        'output_mode': 'base64',
+        'video_base64': video_b64,
+        'file_size_bytes': size,
+    }
+
+
+def _parse_frame_rate(value):
+    """ffprobe의 "30000/1001" 형식 FPS를 float로 (알 수 없으면 None)"""
+    try:
+        fps = float(Fraction(value))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return fps or None
+
+
+def probe_video(path):
+    """ffprobe로 영상 헤더에서 길이/해상도/FPS 읽기
+
+    Returns:
+        dict: {'duration', 'width', 'height', 'fps'}
+    """
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'stream=width,height,avg_frame_rate,r_frame_rate,nb_frames,duration:format=duration',
+         '-of', 'json', path],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise ValueError(f"영상 정보를 읽을 수 없습니다: {result.stderr.strip()}")
+    info = json.loads(result.stdout)
+    if not info.get('streams'):
+        raise ValueError("비디오 스트림이 없습니다")
+    stream = info['streams'][0]
+
+    fps = _parse_frame_rate(stream.get('avg_frame_rate')) or _parse_frame_rate(stream.get('r_frame_rate')) or 25.0
+    duration = info.get('format', {}).get('duration') or stream.get('duration')
+    if duration is None and stream.get('nb_frames'):
+        duration = int(stream['nb_frames']) / fps
+    return {
+        'duration': float(duration or 0.0),
+        'width': int(stream.get('width', 0)),
+        'height': int(stream.get('height', 0)),
+        'fps': fps,
+    }
+
+
+def _fetch_range(url, start, end, timeout):
+    response = requests.get(url, headers={'Range': f'bytes={start}-{end}'}, timeout=timeout, stream=True)
+    response.raise_for_status()
+    content_range = response.headers.get('Content-Range', '')
+    if response.status_code != 206 or not content_range.rsplit('/', 1)[-1].isdigit():
+        response.close()
+        return None, None  # Range 미지원 서버 (또는 전체 크기를 알려주지 않음)
+    return response.content, int(content_range.rsplit('/', 1)[1])
+
+
+def probe_remote_video(url, range_bytes=PROBE_RANGE_BYTES, timeout=30):
+    """URL 영상을 전부 받지 않고 앞/뒤 range_bytes만 받아 ffprobe
+
+    원본 크기의 sparse 파일에 앞/뒤 조각만 써서 moov 위치(앞 또는 뒤)와 무관하게 헤더를 읽음.
+
+    Returns:
+        dict | None: probe_video 결과 (서버가 Range 요청을 지원하지 않으면 None)
+
+    Raises:
+        requests.RequestException, ValueError: 요청 실패 또는 앞/뒤 조각만으로 헤더를 읽지 못한 경우
+    """
+    head, total = _fetch_range(url, 0, range_bytes - 1, timeout)
+    if head is None:
+        return None
+
+    fd, path = tempfile.mkstemp(suffix='.probe')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.truncate(total)
+            f.write(head)
+            if total > len(head):
+                tail_start = max(len(head), total - range_bytes)
+                tail, _ = _fetch_range(url, tail_start, total - 1, timeout)
+                if tail is None:
+                    return None
+                f.seek(tail_start)
+                f.write(tail)
+        return probe_video(path)
+    finally:
+        os.remove(path)
+
+
+def estimate_cost(video_info, max_fps=None, max_dim=None, cost_model=COST_MODEL):
+    """영상 정보로 예상 처리 시간 계산 (max_fps/max_dim은 다운스케일 후 값 계산용)"""
+    fps = min(video_info['fps'], max_fps) if max_fps else video_info['fps']
+    width, height = video_info['width'], video_info['height']
+    if max_dim and max(width, height) > max_dim:
+        ratio = max_dim / max(width, height)
+        width, height = int(width * ratio), int(height * ratio)
+    frames = int(round(video_info['duration'] * fps))
+    megapixels = width * height / 1e6
+    estimated = (cost_model['base_seconds']
+                 + cost_model['per_frame_seconds'] * frames
+                 + cost_model['per_megapixel_frame_seconds'] * frames * megapixels)
+    return {
+        **video_info,
+        'effective_fps': round(fps, 3),
+        'effective_width': width,
+        'effective_height': height,
+        'frames': frames,
+        'estimated_seconds': round(estimated, 2),
+    }
+
+
+def admit_job(video_info, limits=ADMISSION_LIMITS, cost_model=COST_MODEL):
+    """작업 수락 여부 결정
+
+    Returns:
+        dict: {'action': "accept" | "downscale" | "reject", 'reason', 'driving_max_fps',
+               'driving_max_dim', 'cost_estimate'}
+    """
+    decision = {'action': 'accept', 'reason': None, 'driving_max_fps': None, 'driving_max_dim': None}
+    if video_info['duration'] > limits['max_duration_seconds']:
+        decision.update(action='reject',
+                        reason=f"드라이빙 영상이 너무 깁니다 ({video_info['duration']:.1f}초 > "
+                               f"{limits['max_duration_seconds']:.0f}초)")
+        decision['cost_estimate'] = estimate_cost(video_info, cost_model=cost_model)
+        return decision
+
+    reasons = []
+    pixels = video_info['width'] * video_info['height']
+    if pixels > limits['max_pixels']:
+        ratio = (limits['max_pixels'] / pixels) ** 0.5
+        decision['driving_max_dim'] = int(max(video_info['width'], video_info['height']) * ratio)
+        reasons.append(f"해상도 {video_info['width']}x{video_info['height']} 축소")
+
+    estimate = estimate_cost(video_info, max_dim=decision['driving_max_dim'], cost_model=cost_model)
+    if estimate['estimated_seconds'] > limits['max_estimated_seconds']:
+        # 예상 시간이 한도 안에 들어오는 FPS 계산 (min_fps 아래로는 낮추지 않음)
+        per_frame = estimate['estimated_seconds'] - cost_model['base_seconds']
+        budget = limits['max_estimated_seconds'] - cost_model['base_seconds']
+        fps = estimate['effective_fps'] * budget / per_frame if per_frame > 0 else 0
+        if fps < limits['min_fps']:
+            decision.update(action='reject',
+                            reason=f"예상 처리 시간이 한도를 넘습니다 ({estimate['estimated_seconds']:.0f}초 > "
+                                   f"{limits['max_estimated_seconds']:.0f}초)")
+            decision['cost_estimate'] = estimate
+            return decision
+        decision['driving_max_fps'] = round(fps, 2)
+        reasons.append(f"FPS {estimate['effective_fps']:.1f} -> {fps:.1f}")
+        estimate = estimate_cost(video_info, max_fps=decision['driving_max_fps'],
+                                 max_dim=decision['driving_max_dim'], cost_model=cost_model)
+
+    if reasons:
+        if limits['policy'] == 'reject':
+            decision.update(action='reject', reason=f"작업 한도 초과: {', '.join(reasons)} 필요")
+        else:
+            decision.update(action='downscale', reason=', '.join(reasons))
+    decision['cost_estimate'] = estimate
+    return decision
+
+
+def _mem_available_bytes():
+    """/proc/meminfo의 MemAvailable (알 수 없으면 None)"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class ScratchStorage:
+    """작업 중간 파일(입력 이미지/영상, 결과 영상)용 임시 저장소
+    
+    RAM이 충분하면 /dev/shm(tmpfs)에, 파일이 shm_max_bytes보다 크거나 tmpfs 여유 공간/가용 RAM이
+    부족하면 디스크(tempfile.gettempdir())에 만듦. ffmpeg, OpenCV 등이 파일 경로로 읽으므로
+    memfd 대신 tmpfs의 실제 경로를 돌려줌.
+    """
+
+    def __init__(self, shm_dir=SCRATCH_SHM_DIR, shm_max_bytes=SCRATCH_SHM_MAX_BYTES,
+                 ram_headroom_bytes=SCRATCH_RAM_HEADROOM_BYTES, disk_dir=None):
+        self.shm_dir = shm_dir if shm_dir and os.path.isdir(shm_dir) and os.access(shm_dir, os.W_OK) else None
+        self.shm_max_bytes = shm_max_bytes
+        self.ram_headroom_bytes = ram_headroom_bytes
+        self.disk_dir = disk_dir or tempfile.gettempdir()
+
+    def backend_for(self, size):
+        """size 바이트를 쓸 위치 ("shm" 또는 "disk")"""
+        if self.shm_dir is None or size > self.shm_max_bytes:
+            return 'disk'
+        # tmpfs 파일은 RAM을 차지하므로 tmpfs 여유 공간(컨테이너 shm 크기)과 가용 RAM 모두 확인
+        stat = os.statvfs(self.shm_dir)
+        if size > stat.f_bavail * stat.f_frsize:
+            return 'disk'
+        ram_available = _mem_available_bytes()
+        if ram_available is not None and size > ram_available - self.ram_headroom_bytes:
+            return 'disk'
+        return 'shm'
+
+    def _dir_for(self, size_hint):
+        return self.shm_dir if self.backend_for(size_hint) == 'shm' else self.disk_dir
+
+    def backend_of(self, path):
+        """이미 만든 경로가 어느 저장소에 있는지"""
+        if self.shm_dir and os.path.abspath(path).startswith(os.path.abspath(self.shm_dir) + os.sep):
+            return 'shm'
+        return 'disk'
+
+    def new_file(self, suffix='', prefix='liveportrait_', size_hint=SCRATCH_DEFAULT_SIZE_HINT):
+        """빈 임시 파일을 만들고 경로 반환 (이름이 겹치지 않음)"""
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix=prefix, dir=self._dir_for(size_hint))
+        os.close(fd)
+        return path
+
+    def write_bytes(self, data, suffix='', prefix='liveportrait_'):
+        """data를 임시 파일에 쓰고 경로 반환"""
+        path = self.new_file(suffix, prefix, size_hint=len(data))
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def mkdtemp(self, prefix='liveportrait_', size_hint=SCRATCH_DEFAULT_SIZE_HINT):
+        """임시 디렉토리 생성 (size_hint: 디렉토리에 쓸 파일 크기 합계 추정치)"""
+        return tempfile.mkdtemp(prefix=prefix, dir=self._dir_for(size_hint))
+
+
+_scratch_storage = None
+
+
+def get_scratch_storage():
+    """프로세스 전체에서 공유하는 기본 ScratchStorage"""
+    global _scratch_storage
+    if _scratch_storage is None:
+        _scratch_storage = ScratchStorage()
+    return _scratch_storage
+
+
+def _read_proc_fields(path, keys):
+    """/proc의 "key: value" 형식 파일에서 정수 값 읽기 (없으면 빈 dict)"""
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in keys:
+                    values[key] = int(value.split()[0])
+    except (OSError, ValueError):
+        pass
+    return values
+
+
+def _path_bytes(path):
+    """파일 크기 또는 디렉토리 안 파일 크기 합계 (없으면 0)"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # 측정 중 삭제된 파일
+    return total
+
+
+class ResourceMonitor:
+    """with 블록 구간의 작업 자원 사용량 측정
+    
+    백그라운드 스레드가 interval마다 /proc/self/status의 RSS/스레드 수와 임시 파일 크기를 샘플링해
+    최대값을 기록함. CPU 시간은 os.times() 차이(종료된 ffmpeg 등 자식 프로세스 포함), 디스크 쓰기는
+    /proc/self/io의 write_bytes 차이(tmpfs 쓰기는 포함되지 않음). torch가 로드되어 있고 CUDA를
+    쓸 수 있으면 구간 내 최대 GPU 메모리도 기록함 (device: 작업이 쓰는 GPU 번호, None이면 현재
+    기본 GPU). /proc이 없는 환경에서는 해당 값이 None.
+    
+    사용 예시:
+        with ResourceMonitor(scratch_paths=[output_dir], device=device_id) as monitor:
+            ...
+        print(monitor.result)
+    """
+
+    def __init__(self, interval=RESOURCE_SAMPLE_INTERVAL, scratch_paths=(), device=None):
+        self.interval = interval
+        self.scratch_paths = [path for path in scratch_paths if path]
+        self.device = device
+        self.result = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._peak = {'rss': None, 'threads': None, 'scratch': 0}
+        self._samples = 0
+
+    def _sample(self):
+        status = _read_proc_fields('/proc/self/status', ('VmRSS', 'Threads'))
+        if 'VmRSS' in status:
+            self._peak['rss'] = max(self._peak['rss'] or 0, status['VmRSS'] * 1024)
+        if 'Threads' in status:
+            # 샘플링 스레드 자신은 제외
+            threads = status['Threads'] - (1 if self._thread is not None and self._thread.is_alive() else 0)
+            self._peak['threads'] = max(self._peak['threads'] or 0, threads)
+        if self.scratch_paths:
+            self._peak['scratch'] = max(self._peak['scratch'], sum(_path_bytes(p) for p in self.scratch_paths))
+        self._samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        # 최대 RSS(VmHWM)를 현재 값으로 초기화해 이 구간의 최대값을 정확히 얻음 (Linux 4.0+)
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+            self._hwm_reset = True
+        except OSError:
+            self._hwm_reset = False
+        
+        # torch를 새로 import하지 않음 (로드되지 않았다면 GPU를 쓴 작업도 없음)
+        self._torch = sys.modules.get('torch')
+        self._cuda = self._torch is not None and self._torch.cuda.is_available()
+        if self._cuda:
+            self._torch.cuda.reset_peak_memory_stats(self.device)
+        
+        self._start_wall = time.perf_counter()
+        self._start_times = os.times()
+        self._start_io = _read_proc_fields('/proc/self/io', ('write_bytes',))
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        
+        end_times = os.times()
+        end_io = _read_proc_fields('/proc/self/io', ('write_bytes',))
+        peak_rss = self._peak['rss']
+        if self._hwm_reset:
+            hwm = _read_proc_fields('/proc/self/status', ('VmHWM',)).get('VmHWM')
+            if hwm is not None:
+                peak_rss = max(peak_rss or 0, hwm * 1024)
+        
+        self.result = {
+            'wall_seconds': round(time.perf_counter() - self._start_wall, 3),
+            'cpu_user_seconds': round((end_times.user - self._start_times.user)
+                                      + (end_times.children_user - self._start_times.children_user), 3),
+            'cpu_system_seconds': round((end_times.system - self._start_times.system)
+                                        + (end_times.children_system - self._start_times.children_system), 3),
+            'peak_rss_bytes': peak_rss,
+            'peak_threads': self._peak['threads'],
+            'disk_write_bytes': (end_io['write_bytes'] - self._start_io['write_bytes']
+                                 if 'write_bytes' in end_io and 'write_bytes' in self._start_io else None),
+            'peak_scratch_bytes': self._peak['scratch'] if self.scratch_paths else None,
+            'cuda_peak_allocated_bytes': self._torch.cuda.max_memory_allocated(self.device) if self._cuda else None,
+            'cuda_peak_reserved_bytes': self._torch.cuda.max_memory_reserved(self.device) if self._cuda else None,
+            'samples': self._samples,
+        }
+        return False
+
+    def summary(self):
+        """로그용 한 줄 요약"""
+        r = self.result
+        parts = [f"wall {r['wall_seconds']:.1f}s",
+                 f"CPU user {r['cpu_user_seconds']:.1f}s / sys {r['cpu_system_seconds']:.1f}s"]
+        if r['peak_rss_bytes'] is not None:
+            parts.append(f"peak RSS {r['peak_rss_bytes'] / 1024 ** 2:.0f}MB")
+        if r['peak_threads'] is not None:
+            parts.append(f"threads {r['peak_threads']}")
+        if r['disk_write_bytes'] is not None:
+            parts.append(f"disk write {r['disk_write_bytes'] / 1024 ** 2:.1f}MB")
+        if r['peak_scratch_bytes'] is not None:
+            parts.append(f"scratch {r['peak_scratch_bytes'] / 1024 ** 2:.1f}MB")
+        if r['cuda_peak_allocated_bytes'] is not None:
+            parts.append(f"GPU peak {r['cuda_peak_allocated_bytes'] / 1024 ** 2:.0f}MB")
+        return ', '.join(parts)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from job_utils import ResourceMonitor, ScratchStorage, admit_job, deliver_output, probe_remote_video, upload_file
+
+
+class _PresignedPutStandIn(BaseHTTPRequestHandler):
+    """presigned PUT URL 역할을 하는 로컬 HTTP 서버 (처음 fail_count번은 503 응답)"""
+    fail_count = 0
+    uploads = []
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if type(self).fail_count > 0:
+            type(self).fail_count -= 1
+            self.send_response(503)
+        else:
+            type(self).uploads.append({'path': self.path, 'body': body, 'headers': dict(self.headers)})
+            self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_stand_in(fail_count=0):
+    _PresignedPutStandIn.fail_count = fail_count
+    _PresignedPutStandIn.uploads = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _PresignedPutStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _write_temp_video(size):
+    fd, path = tempfile.mkstemp(suffix='.mp4')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(os.urandom(size))
+    return path
+
+
+def test_upload_file_streams_and_retries():
+    """5xx 응답 후 재시도해서 업로드하고, 서명 없는 URL/크기/체크섬을 반환"""
+    server, base_url = _start_stand_in(fail_count=1)
+    path = _write_temp_video(3 * 1024 * 1024 + 17)
+    try:
+        result = upload_file(path, f"{base_url}/bucket/result.mp4?X-Amz-Signature=abc",
+                             backoff=0, chunk_size=256 * 1024)
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        assert result == {
+            'url': f"{base_url}/bucket/result.mp4",
+            'size': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+        }
+        assert len(_PresignedPutStandIn.uploads) == 1
+        upload = _PresignedPutStandIn.uploads[0]
+        assert upload['body'] == data
+        assert upload['headers']['Content-Length'] == str(len(data))
+        assert 'Transfer-Encoding' not in upload['headers']
+    finally:
+        server.shutdown()
+        os.remove(path)
+
+
+def test_deliver_output_auto_mode():
+    """auto 모드: 임계값 이하는 base64, 초과하면 업로드"""
+    server, base_url = _start_stand_in()
+    path = _write_temp_video(2048)
+    try:
+        inline = deliver_output(path, upload_url=f"{base_url}/small.mp4", inline_max_bytes=4096)
+        assert inline['output_mode'] == 'base64'
+        assert inline['file_size_bytes'] == 2048
+        assert not _PresignedPutStandIn.uploads
+
+        uploaded = deliver_output(path, upload_url=f"{base_url}/large.mp4", inline_max_bytes=1024)
+        assert uploaded['output_mode'] == 'upload'
+        assert uploaded['video_url'] == f"{base_url}/large.mp4"
+        assert 'video_base64' not in uploaded
+    finally:
+        server.shutdown()
+        os.remove(path)
+
+
+class _RangeServerStandIn(BaseHTTPRequestHandler):
+    """Range 요청을 제대로 지원하지 않는 영상 서버 (mode: "ignore" - 200 전체 응답, "no_total" - Content-Range 없음)"""
+    mode = 'ignore'
+
+    def do_GET(self):
+        body = b'\0' * 4096
+        if type(self).mode == 'ignore':
+            self.send_response(200)
+        else:
+            self.send_response(206)
+            body = body[:1024]
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_probe_remote_video_without_range_support():
+    """Range를 무시하거나 전체 크기를 알려주지 않는 서버는 None (다운로드 후 probe로 대체)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _RangeServerStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for mode in ('ignore', 'no_total'):
+            _RangeServerStandIn.mode = mode
+            assert probe_remote_video(f"http://127.0.0.1:{server.server_address[1]}/driving.mp4") is None
+    finally:
+        server.shutdown()
+
+
+def test_admit_job_downscale_and_reject():
+    """한도 안은 수락, 해상도/예상 시간 초과는 다운스케일, 너무 긴 영상은 거절"""
+    limits = {'max_duration_seconds': 120, 'max_pixels': 1280 * 720, 'max_estimated_seconds': 60,
+              'min_fps': 10, 'policy': 'downscale'}
+    cost_model = {'base_seconds': 10.0, 'per_frame_seconds': 0.05, 'per_megapixel_frame_seconds': 0.0}
+
+    small = {'duration': 10.0, 'width': 640, 'height': 360, 'fps': 30.0}
+    decision = admit_job(small, limits, cost_model)
+    assert decision['action'] == 'accept'
+    assert decision['cost_estimate']['frames'] == 300
+    assert decision['cost_estimate']['estimated_seconds'] == 25.0
+
+    # 4K 60초: 해상도 축소 + FPS를 (60 - 10) / 0.05 / 60 = 16.7로 낮춤
+    large = {'duration': 60.0, 'width': 3840, 'height': 2160, 'fps': 30.0}
+    decision = admit_job(large, limits, cost_model)
+    assert decision['action'] == 'downscale'
+    assert decision['driving_max_dim'] == 1280
+    assert decision['driving_max_fps'] == 16.67
+    assert decision['cost_estimate']['estimated_seconds'] <= 60
+
+    assert admit_job(large, {**limits, 'policy': 'reject'}, cost_model)['action'] == 'reject'
+    assert admit_job({**small, 'duration': 600.0}, limits, cost_model)['action'] == 'reject'
+    # min_fps 아래로 낮춰야 하는 작업은 거절
+    assert admit_job({**small, 'duration': 110.0}, limits, cost_model)['action'] == 'reject'
+
+
+def test_scratch_storage_falls_back_to_disk():
+    """shm 한도 이하는 shm 디렉토리, 한도를 넘거나 shm이 없으면 디스크 디렉토리에 생성"""
+    shm_dir, disk_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    try:
+        storage = ScratchStorage(shm_dir=shm_dir, shm_max_bytes=1024, ram_headroom_bytes=0, disk_dir=disk_dir)
+        small = storage.write_bytes(b'x' * 100, suffix='.mp4', prefix='driving_video_')
+        large = storage.write_bytes(b'x' * 2048, suffix='.mp4', prefix='driving_video_')
+        assert os.path.dirname(small) == shm_dir and storage.backend_of(small) == 'shm'
+        assert os.path.dirname(large) == disk_dir and storage.backend_of(large) == 'disk'
+        assert small.endswith('.mp4') and small != storage.write_bytes(b'x' * 100, suffix='.mp4')
+        
+        no_shm = ScratchStorage(shm_dir=None, disk_dir=disk_dir)
+        assert os.path.dirname(no_shm.mkdtemp(size_hint=1)) == disk_dir
+    finally:
+        shutil.rmtree(shm_dir)
+        shutil.rmtree(disk_dir)
+
+
+def test_resource_monitor_cpu_only():
+    """CPU만 있는 환경에서도 CPU 시간/최대 RSS/스레드 수/임시 파일 크기를 기록"""
+    scratch_dir = tempfile.mkdtemp()
+    try:
+        with ResourceMonitor(interval=0.01, scratch_paths=[scratch_dir]) as monitor:
+            buffer = bytearray(64 * 1024 * 1024)  # RSS 증가
+            for i in range(0, len(buffer), 4096):
+                buffer[i] = 1
+            worker = threading.Thread(target=time.sleep, args=(0.1,))
+            worker.start()
+            with open(os.path.join(scratch_dir, 'frame.bin'), 'wb') as f:
+                f.write(os.urandom(1024 * 1024))
+            sum(range(2_000_000))
+            worker.join()
+            del buffer
+        
+        result = monitor.result
+        assert result['cpu_user_seconds'] + result['cpu_system_seconds'] > 0
+        assert result['peak_rss_bytes'] >= 64 * 1024 * 1024
+        assert result['peak_threads'] >= 2
+        assert result['peak_scratch_bytes'] == 1024 * 1024
+        assert result['cuda_peak_allocated_bytes'] is None or result['cuda_peak_allocated_bytes'] >= 0
+        assert 'peak RSS' in monitor.summary()
+    finally:
+        shutil.rmtree(scratch_dir)
+
+
+def test_resource_monitor_records_failed_block():
+    """with 블록에서 예외가 나도(변환 실패/OOM) 자원 사용량을 기록하고 예외는 그대로 전달"""
+    monitor = ResourceMonitor(interval=0.01)
+    try:
+        with monitor:
+            raise MemoryError("out of memory")
+    except MemoryError:
+        pass
+    else:
+        raise AssertionError("예외가 전달되지 않음")
+    
+    assert monitor.result is not None and monitor.result['wall_seconds'] >= 0
+    assert 'wall' in monitor.summary()
+
+
+class _CudaStandIn:
+    """torch.cuda 대역: 최대 메모리 조회/초기화에 전달된 GPU 번호를 기록"""
+
+    def __init__(self):
+        self.devices = []
+
+    def is_available(self):
+        return True
+
+    def reset_peak_memory_stats(self, device=None):
+        self.devices.append(('reset', device))
+
+    def max_memory_allocated(self, device=None):
+        self.devices.append(('allocated', device))
+        return 1024
+
+    def max_memory_reserved(self, device=None):
+        self.devices.append(('reserved', device))
+        return 2048
+
+
+def test_resource_monitor_uses_job_device():
+    """GPU 최대 메모리는 기본 GPU가 아니라 작업이 쓰는 device에서 측정"""
+    cuda = _CudaStandIn()
+    original = sys.modules.get('torch')
+    sys.modules['torch'] = types.SimpleNamespace(cuda=cuda)
+    try:
+        with ResourceMonitor(interval=1.0, device=1) as monitor:
+            pass
+    finally:
+        if original is None:
+            del sys.modules['torch']
+        else:
+            sys.modules['torch'] = original
+    
+    assert cuda.devices == [('reset', 1), ('allocated', 1), ('reserved', 1)]
+    assert monitor.result['cuda_peak_allocated_bytes'] == 1024
+    assert monitor.result['cuda_peak_reserved_bytes'] == 2048
+
+
+if __name__ == "__main__":
+    test_upload_file_streams_and_retries()
+    test_deliver_output_auto_mode()
+    test_probe_remote_video_without_range_support()
+    test_admit_job_downscale_and_reject()
+    test_scratch_storage_falls_back_to_disk()
+    test_resource_monitor_cpu_only()
+    test_resource_monitor_records_failed_block()
+    test_resource_monitor_uses_job_device()
+    print("✅ job_utils 테스트 통과")
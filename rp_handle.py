@@ -1,8 +1,11 @@
 
-import base64
 import os
 import json
-from action import LivePortraitConverter, load_image_from_input, load_video_from_input
+import time
+import shutil
+from action import LivePortraitConverter, load_image_from_input, load_video_from_input, motion_template_path
+from job_utils import (INLINE_MAX_BYTES, ResourceMonitor, admit_job, deliver_output, get_scratch_storage,
+                       probe_remote_video, probe_video)
 
 # RunPod import with fallback for testing
 try:
@@ -49,6 +52,11 @@ except ImportError:
 
 def handler(job):
     """RunPod 핸들러 함수 - LivePortrait를 사용한 이미지-영상 변환"""
+    job_start = time.perf_counter()
+    admission = None
+    resources = None  # 변환 구간 자원 사용량 (변환이 실패해도 기록)
+    # 작업 중 만든 임시 파일/폴더 (RAM 기반 저장소가 쌓이지 않도록 성공/실패와 무관하게 정리)
+    source_image_path = driving_video_path = current_output_dir = None
     try:
         # 입력 데이터 파싱
         job_input = job.get('input', {})
@@ -68,9 +76,32 @@ def handler(job):
         driving_multiplier = job_input.get('driving_multiplier', 1.0)
         audio_priority = job_input.get('audio_priority', 'driving')
         animation_region = job_input.get('animation_region', "all")
+        quality = job_input.get('quality', 'final')  # "preview" | "final"
+        
+        # 출력 인코딩 옵션 (비디오 인코딩과 오디오 mux는 ffmpeg 한 번으로 처리)
+        encode_options = {
+            'video_codec': job_input.get('video_codec', 'libx264'),
+            'video_crf': job_input.get('video_crf', 18),
+            'video_bitrate': job_input.get('video_bitrate'),  # 지정 시 CRF 대신 사용 (예: "2M")
+            'video_preset': job_input.get('video_preset'),
+            'output_scale': job_input.get('output_scale', 1.0),
+            'pixel_format': job_input.get('pixel_format', 'yuv420p'),
+        }
+        
+        # 결과 전달 방식 (큰 결과는 presigned URL/S3로 스트리밍 업로드)
+        output_mode = job_input.get('output_mode', 'auto')  # "auto" | "base64" | "upload"
+        output_upload_url = job_input.get('output_upload_url')  # presigned PUT URL
+        output_s3 = job_input.get('output_s3')  # {bucket, key, endpoint_url, access_key, secret_key, region}
+        inline_max_bytes = job_input.get('inline_max_bytes', INLINE_MAX_BYTES)
+        save_local_copy = job_input.get('save_local_copy', False)  # 디버깅용: 결과를 현재 디렉토리에도 복사
         
         # 속도 최적화 옵션
         flag_save_concat_video = job_input.get('flag_save_concat_video', False)  # 기본적으로 concat 비활성화로 속도 향상
+        frame_batch_size = job_input.get('frame_batch_size', 1)  # K개 프레임 단위 배치 추론
+        driving_track_interval = job_input.get('driving_track_interval', 1)  # 드라이빙 크롭 시 랜드마크 간격
+        driving_track_min_confidence = job_input.get('driving_track_min_confidence', 0.8)
+        motion_reuse_eps = job_input.get('motion_reuse_eps', 0.0)  # 저움직임 구간 프레임 재사용 기준
+        deadline_ms = job_input.get('deadline_ms')  # 작업 전체 마감 시간 (넘기면 품질 저하/부분 영상)
         
         # 입력 검증
         if not source_image:
@@ -82,10 +113,43 @@ def handler(job):
         print(f"  - 설정: {driving_option}, multiplier: {driving_multiplier}")
         print(f"  - 애니메이션 영역: {animation_region}")
         
+        # 작업 수락: 드라이빙 영상 헤더만 읽어 비용 추정 (URL은 앞/뒤 1MB만 받아서 probe)
+        # probe 시간은 비용 모델 보정용이므로 입력 다운로드/디코딩 시간과 따로 측정
+        driving_info = None
+        probe_seconds = 0.0
+        if driving_video.startswith(('http://', 'https://')):
+            probe_start = time.perf_counter()
+            try:
+                driving_info = probe_remote_video(driving_video)
+            except Exception as probe_error:
+                # Range 요청 거부(403 등), 1MB 밖에 있는 moov 등 - 다운로드 후 전체 파일로 다시 probe
+                print(f"⚠️  URL 부분 probe 실패, 다운로드 후 probe: {probe_error}")
+            probe_seconds += time.perf_counter() - probe_start
+            if driving_info is not None:
+                admission = admit_job(driving_info)
+                if admission['action'] == 'reject':
+                    raise ValueError(admission['reason'])
+        
         # 이미지와 영상을 임시 파일로 저장
         print("입력 파일 처리 중...")
+        download_start = time.perf_counter()
         source_image_path = load_image_from_input(source_image)
         driving_video_path = load_video_from_input(driving_video)
+        input_download_seconds = time.perf_counter() - download_start
+        
+        if driving_info is None:
+            # base64 입력이거나 Range 요청을 지원하지 않는/부분 probe가 실패한 서버
+            probe_start = time.perf_counter()
+            driving_info = probe_video(driving_video_path)
+            probe_seconds += time.perf_counter() - probe_start
+            admission = admit_job(driving_info)
+            if admission['action'] == 'reject':
+                raise ValueError(admission['reason'])
+        estimate = admission['cost_estimate']
+        print(f"📊 예상 처리 시간: {estimate['estimated_seconds']:.1f}초 "
+              f"({estimate['frames']} 프레임, {estimate['effective_width']}x{estimate['effective_height']})")
+        if admission['action'] == 'downscale':
+            print(f"⚠️  작업 한도 초과로 다운스케일: {admission['reason']}")
         
         # LivePortraitConverter 생성 및 영상 변환
         print("LivePortraitConverter 초기화 중...")
@@ -93,70 +157,94 @@ def handler(job):
         
         print("LivePortrait 변환 실행 중...")
         
-        # 현재 디렉토리에 출력 폴더 생성
-        current_output_dir = os.path.join(os.getcwd(), "liveportrait_output")
-        os.makedirs(current_output_dir, exist_ok=True)
+        # 작업별 출력 폴더 (RAM이 충분하면 /dev/shm, 결과 영상 + 추출한 오디오 크기 추정)
+        current_output_dir = get_scratch_storage().mkdtemp(
+            prefix='liveportrait_output_', size_hint=2 * os.path.getsize(driving_video_path) + 64 * 1024 * 1024)
         print(f"📁 출력 디렉토리: {current_output_dir}")
         
-        output_video_path = converter.convert_image_video_to_video(
-            source_image_path=source_image_path,
-            driving_video_path=driving_video_path,
-            output_dir=current_output_dir,  # 현재 디렉토리의 출력 폴더 지정
-            flag_use_half_precision=flag_use_half_precision,
-            flag_crop_driving_video=flag_crop_driving_video,
-            device_id=device_id,
-            flag_force_cpu=flag_force_cpu,
-            flag_stitching=flag_stitching,
-            flag_relative_motion=flag_relative_motion,
-            flag_pasteback=flag_pasteback,
-            flag_do_crop=flag_do_crop,
-            driving_option=driving_option,
-            driving_multiplier=driving_multiplier,
-            audio_priority=audio_priority,
-            animation_region=animation_region,
-            flag_save_concat_video=flag_save_concat_video
-        )
-        
-        # 현재 디렉토리에 최종 결과 파일 복사 (접근 편의성)
-        import shutil
-        final_output_filename = f"liveportrait_result_{hash(source_image + driving_video) % 100000}.mp4"
-        final_output_path = os.path.join(os.getcwd(), final_output_filename)
+        convert_start = time.perf_counter()
+        if deadline_ms:
+            # 입력 다운로드/probe에 쓴 시간을 빼고 변환에 남은 시간만 전달
+            deadline_ms = max(1, int(deadline_ms - (convert_start - job_start) * 1000))
+        # 변환 구간의 자원 사용량 측정 (인스턴스 크기 산정용, 실패/OOM 작업도 기록)
+        resources = ResourceMonitor(scratch_paths=[current_output_dir, source_image_path, driving_video_path],
+                                    device=device_id)
+        with resources:
+            output_video_path = converter.convert_image_video_to_video(
+                source_image_path=source_image_path,
+                driving_video_path=driving_video_path,
+                output_dir=current_output_dir,  # 작업별 출력 폴더 지정
+                flag_use_half_precision=flag_use_half_precision,
+                flag_crop_driving_video=flag_crop_driving_video,
+                device_id=device_id,
+                flag_force_cpu=flag_force_cpu,
+                flag_stitching=flag_stitching,
+                flag_relative_motion=flag_relative_motion,
+                flag_pasteback=flag_pasteback,
+                flag_do_crop=flag_do_crop,
+                driving_option=driving_option,
+                driving_multiplier=driving_multiplier,
+                audio_priority=audio_priority,
+                animation_region=animation_region,
+                quality=quality,
+                **encode_options,
+                flag_save_concat_video=flag_save_concat_video,
+                frame_batch_size=frame_batch_size,
+                driving_track_interval=driving_track_interval,
+                driving_track_min_confidence=driving_track_min_confidence,
+                motion_reuse_eps=motion_reuse_eps,
+                driving_max_fps=admission['driving_max_fps'],
+                driving_max_dim=admission['driving_max_dim'],
+                deadline_ms=deadline_ms
+            )
+        print(f"📊 자원 사용량: {resources.summary()}")
+        convert_seconds = time.perf_counter() - convert_start
+        render_stats = converter.last_stats
         
-        shutil.copy2(output_video_path, final_output_path)
-        print(f"📁 최종 결과 파일: {final_output_path}")
+        if save_local_copy:
+            # 현재 디렉토리에 최종 결과 파일 복사 (디스크 쓰기가 생기므로 요청 시에만)
+            final_output_filename = f"liveportrait_result_{hash(source_image + driving_video) % 100000}.mp4"
+            final_output_path = os.path.join(os.getcwd(), final_output_filename)
+            shutil.copy2(output_video_path, final_output_path)
+            print(f"📁 최종 결과 파일: {final_output_path}")
         
-        # 생성된 비디오 파일을 base64로 인코딩
-        print("비디오를 Base64로 인코딩 중...")
-        with open(output_video_path, 'rb') as video_file:
-            video_b64 = base64.b64encode(video_file.read()).decode('utf-8')
+        # 결과 전달: 작은 결과는 base64, 큰 결과는 업로드 후 URL/크기/체크섬만 응답
+        delivery = deliver_output(
+            output_video_path,
+            output_mode=output_mode,
+            upload_url=output_upload_url,
+            s3_config=output_s3,
+            inline_max_bytes=inline_max_bytes,
+        )
       
         print("처리 완료! 비디오 경로:", output_video_path)
-        print(f"📂 현재 디렉토리 결과: {final_output_path}")
-        
-        # 파일 정보 수집
-        file_size = os.path.getsize(output_video_path)
-        
-        # 임시 파일 정리
-        try:
-            if os.path.exists(source_image_path):
-                os.remove(source_image_path)
-            if os.path.exists(driving_video_path):
-                os.remove(driving_video_path)
-        except Exception as cleanup_error:
-            print(f"임시 파일 정리 중 오류: {cleanup_error}")
         
         return {
             'status': 'success',
             'output': {
                 'success': True,
-                'video_base64': video_b64,
-                'file_size_bytes': file_size,
+                **delivery,
                 'source_image_processed': True,
                 'driving_video_processed': True,
                 'driving_option': driving_option,
                 'driving_multiplier': driving_multiplier,
                 'animation_region': animation_region,
                 'audio_priority': audio_priority,
+                'quality': quality,
+                'frame_batch_size': frame_batch_size,
+                'frames_total': render_stats.get('frames_total'),
+                'frames_skipped': render_stats.get('frames_skipped', 0),
+                'degradations': render_stats.get('deadline', {}).get('degradations', []),
+                'partial': render_stats.get('deadline', {}).get('partial', False),
+                'resources': resources.result,
+                'admission': admission['action'],
+                'cost_estimate': estimate,
+                'timing': {
+                    'probe_seconds': round(probe_seconds, 3),
+                    'input_download_seconds': round(input_download_seconds, 3),
+                    'convert_seconds': round(convert_seconds, 3),
+                    'total_seconds': round(time.perf_counter() - job_start, 3),
+                },
                 'job_id': f"liveportrait_{hash(source_image + driving_video) % 100000}"
             }
         }
@@ -167,13 +255,34 @@ def handler(job):
         import traceback
         traceback.print_exc()
         
+        resource_usage = resources.result if resources is not None else None
+        if resource_usage:
+            print(f"📊 자원 사용량 (실패한 작업): {resources.summary()}")
+        
         return {
             'status': 'error',
             'output': {
                 'success': False,
-                'error': error_msg
+                'error': error_msg,
+                'admission': admission['action'] if admission else None,
+                'cost_estimate': admission['cost_estimate'] if admission else None,
+                'resources': resource_usage
             }
         }
+    
+    finally:
+        # 임시 파일 정리 (원본 파이프라인이 드라이빙 영상 옆에 저장한 모션 템플릿 포함)
+        try:
+            temp_paths = [source_image_path, driving_video_path]
+            if driving_video_path:
+                temp_paths.append(motion_template_path(driving_video_path))
+            for path in temp_paths:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            if current_output_dir:
+                shutil.rmtree(current_output_dir, ignore_errors=True)
+        except Exception as cleanup_error:
+            print(f"임시 파일 정리 중 오류: {cleanup_error}")
 
 # RunPod 서버리스 환경에서 실행
 runpod.serverless.start({'handler': handler})
\ No newline at end of file